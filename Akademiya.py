@@ -1,10 +1,16 @@
-import os
-import re
 import base64
 
 import streamlit as st
 from dotenv import load_dotenv
-import fitz  # PyMuPDF
+
+import utils
+import token_budget
+import pdf_preview
+import pdf_extraction
+import job_panel
+import instrumentation
+from extraction_cache import ExtractionCache
+from upload_store import get_upload_store, upload_fingerprint
 
 # --- Page Config ---
 st.set_page_config(
@@ -31,7 +37,7 @@ load_dotenv()
 
 
 # --- Constants ---
-MAX_WORDS = 7500  # Max words to process from PDF
+MAX_INPUT_TOKENS = token_budget.get_input_token_budget()  # Max document tokens sent to the model
 
 
 # --- Helper Functions ---
@@ -45,30 +51,88 @@ def show_pdf_from_bytes(pdf_bytes):
         st.error(f"Error displaying PDF: {e}")
 
 
-def extract_text_from_bytes(pdf_bytes):
+@st.cache_resource
+def get_thumbnail_cache():
+    # Rendered pages are shared by every session, like extracted text
+    return pdf_preview.ThumbnailCache()
+
+
+def show_pdf_thumbnails(pdf_path, content_hash, page_count):
+    """Shows a paginated grid of page thumbnails.
+
+    Only the pages in the current view are rendered and sent to the browser,
+    instead of the whole file.
+    """
+    views = max(1, -(-page_count // pdf_preview.DEFAULT_PAGES_PER_VIEW))
+    view = 1
+    if views > 1:
+        view = st.number_input(f"Preview pages (1-{views})", min_value=1, max_value=views, step=1, key="preview_view")
+    first = (view - 1) * pdf_preview.DEFAULT_PAGES_PER_VIEW
+    page_numbers = list(range(first, min(page_count, first + pdf_preview.DEFAULT_PAGES_PER_VIEW)))
+    try:
+        thumbnails = pdf_preview.render_thumbnails(pdf_path, content_hash, page_numbers, get_thumbnail_cache())
+    except Exception as e:
+        st.error(f"Error displaying PDF: {e}")
+        return
+    columns = st.columns(2)
+    for i, (page_number, png_bytes) in enumerate(zip(page_numbers, thumbnails)):
+        with columns[i % 2]:
+            st.image(png_bytes, caption=f"Page {page_number + 1} of {page_count}", use_container_width=True)
+
+
+@instrumentation.traced("extract_text_from_file")
+def extract_text_from_file(pdf_path):
     try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        return text
+        # Stops opening pages once MAX_INPUT_TOKENS tokens (for the generation model) are collected
+        result = pdf_extraction.extract_with_budget(pdf_path, max_tokens=MAX_INPUT_TOKENS, model=utils.DEFAULT_MODEL)
+        instrumentation.record(boilerplate_tokens_saved=result['boilerplate_tokens_saved'])
+        return result
     except Exception as e:
         st.error(f"Error reading PDF: {e}")
-        return ""
+        return None
+
+
+@st.cache_resource
+def get_extraction_cache():
+    # One cache per process, shared by every session
+    return ExtractionCache()
 
 
-def clean_extracted_text(text):
-    # Basic cleaning: Replace multiple whitespace chars with single space
-    cleaned_text = re.sub(r'\s+', ' ', text)
-    return cleaned_text.strip()
+def process_pdf(pdf_path, content_hash):
+    """Extracts cleaned text up to MAX_INPUT_TOKENS, reusing cached results.
+
+    Args:
+        pdf_path (str): Path of the spooled upload.
+        content_hash (str): SHA-256 of the upload (see UploadStore.put).
+
+    Returns:
+        dict as returned by pdf_extraction.extract_with_budget, or None if no
+        text could be extracted.
+    """
+    cache = get_extraction_cache()
+    cached = cache.get(content_hash)
+    # Entries extracted under a different budget, tokenizer or cleaning stage are re-extracted
+    if (
+        cached and cached.get('max_tokens') == MAX_INPUT_TOKENS and cached.get('model') == utils.DEFAULT_MODEL
+        and cached.get('cleaning_version') == pdf_extraction.CLEANING_VERSION
+    ):
+        return cached
+
+    result = extract_text_from_file(pdf_path)
+    if not result or not result['text']:
+        return None
+    result['max_tokens'] = MAX_INPUT_TOKENS
+    result['model'] = utils.DEFAULT_MODEL
+    cache.put(content_hash, result)
+    return result
 
 
 # --- Session State Initialization ---
 def initialize_state():
     state_keys = [
-        'uploaded_bytes', 'extracted_text', 'gpt_response_raw',
+        'upload_fingerprint', 'document_hash', 'document_path', 'extracted_text', 'gpt_response_raw',
         'summary', 'key_points', 'flashcards', 'quiz',
-        'parsing_failed'
+        'parsing_failed', 'document_truncated', 'page_count', 'artifact_key'
     ]
     for key in state_keys:
         if key not in st.session_state:
@@ -91,38 +155,74 @@ uploaded = st.file_uploader(
 
 # Process uploaded file
 if uploaded:
-    uploaded_bytes_value = uploaded.getvalue()
-    if st.session_state.get('uploaded_bytes') != uploaded_bytes_value:
-        st.session_state['uploaded_bytes'] = uploaded_bytes_value
+    # Reruns compare a short upload id instead of the whole file
+    fingerprint = upload_fingerprint(uploaded)
+    if st.session_state.get('upload_fingerprint') != fingerprint:
+        st.session_state['upload_fingerprint'] = fingerprint
         
         keys_to_reset = [
             'extracted_text', 'gpt_response_raw', 'summary', 
-            'key_points', 'flashcards', 'quiz'
+            'key_points', 'flashcards', 'quiz', 'document_truncated', 'page_count', 'artifact_key'
         ]
         for key in keys_to_reset:
             st.session_state[key] = None 
             
         st.session_state['parsing_failed'] = False
+        st.session_state['preview_view'] = 1
 
-        # Attempt text extraction
+        # Spool the upload to disk once; everything after works from the file
         with st.spinner("Processing PDF..."):
-            raw_text = extract_text_from_bytes(st.session_state['uploaded_bytes'])
-        if raw_text:
-            cleaned_text = clean_extracted_text(raw_text)
-            words = cleaned_text.split()
-            if len(words) > MAX_WORDS:
-                st.warning(f"PDF is long; only the first {MAX_WORDS} words ({len(words)} provided) will be processed.")
-                cleaned_text = ' '.join(words[:MAX_WORDS])
-            st.session_state['extracted_text'] = cleaned_text
+            try:
+                content_hash, pdf_path = get_upload_store().put(uploaded)
+            except OSError as e:
+                st.error(f"Error saving PDF: {e}")
+                content_hash, pdf_path = None, None
+            st.session_state['document_hash'] = content_hash
+            st.session_state['document_path'] = pdf_path
+            # Attempt text extraction (served from the shared cache on repeat uploads)
+            processed = process_pdf(pdf_path, content_hash) if pdf_path else None
+        if processed:
+            if processed['truncated_at_page']:
+                st.warning(
+                    f"PDF is long; only the first {MAX_INPUT_TOKENS} tokens (up to page "
+                    f"{processed['truncated_at_page']} of {processed['page_count']}) will be processed."
+                )
+            st.session_state['extracted_text'] = processed['text']
+            st.session_state['document_truncated'] = bool(processed['truncated_at_page'])
+            st.session_state['page_count'] = processed['page_count']
             st.success("PDF processed successfully!")
+            if processed.get('boilerplate_lines_removed'):
+                st.caption(
+                    f"Removed {processed['boilerplate_lines_removed']} repeated header/footer lines "
+                    f"(~{processed['boilerplate_tokens_saved']:,} tokens saved)."
+                )
+            # Material generated for this PDF before (in any session) is loaded without an API call
+            if job_panel.restore_artifact(content_hash):
+                st.info("Loaded study material generated earlier for this PDF.")
         else:
             st.error("Could not extract text from the PDF.")
-            st.session_state['uploaded_bytes'] = None 
+            st.session_state['document_path'] = None
 
 # Display Previews (only if upload was successful)
-if st.session_state.get('uploaded_bytes'):
+if st.session_state.get('document_path'):
     st.subheader("PDF Preview:")
-    show_pdf_from_bytes(st.session_state['uploaded_bytes'])
+    # Looking the file up marks it recently used, so other sessions' uploads don't evict it
+    document_path = get_upload_store().get_path(st.session_state['document_hash'])
+    if document_path is None:
+        st.warning("The PDF is no longer in temporary storage; upload it again to preview it.")
+    # The embedded viewer ships the whole file (base64) on every rerun; thumbnails only send visible pages
+    elif st.toggle("Show full document viewer", value=False, key="embed_full_pdf"):
+        try:
+            with open(document_path, "rb") as f:
+                show_pdf_from_bytes(f.read())
+        except OSError as e:
+            st.error(f"Error displaying PDF: {e}")
+    elif st.session_state.get('page_count'):
+        show_pdf_thumbnails(
+            document_path,
+            st.session_state['document_hash'],
+            st.session_state['page_count']
+        )
 
     if st.session_state.get('extracted_text'):
          with st.expander("View Extracted Text"):
@@ -143,6 +243,9 @@ if st.session_state.get('extracted_text'):
         except Exception as e:
             st.error(f"Navigation failed (requires Streamlit 1.28+): {e}")
             st.info("Please navigate using the sidebar.")
+    if st.session_state.get('artifact_key'):
+        if st.button("View Saved Results ->", use_container_width=True):
+            st.switch_page("pages/2_Results.py")
 
 else:
     # Show info if no PDF is uploaded yet
@@ -0,0 +1,274 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+
+import response_schema
+
+# --- Default Constants ---
+DEFAULT_ARTIFACT_PATH = os.path.join(tempfile.gettempdir(), "akademiya_artifacts.sqlite")
+DECK_FORMAT = "akademiya-deck"
+DECK_VERSION = 1
+TEXT_SECTIONS = ("summary", "key_points")  # Stored whole, as JSON
+ITEM_SECTIONS = ("flashcards", "quiz")  # Stored one row per item, so edits touch a single row
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def generation_config(sections, model, long_document=False):
+    """Returns the generation settings an artifact is keyed by.
+
+    Args:
+        sections (dict): Section settings from utils.build_generation_prompt.
+        model (str): Model used for generation.
+        long_document (bool): True for map-reduce generation over the whole PDF.
+    """
+    return {"sections": sections, "model": model, "long_document": bool(long_document)}
+
+
+def make_config_key(config):
+    """Returns the key for a generation config (styles, counts, model...).
+
+    Args:
+        config (dict): JSON-serialisable generation settings.
+
+    Returns:
+        str: Hex SHA-256 digest of the canonical JSON form.
+    """
+    payload = json.dumps(config, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ArtifactStore:
+    """SQLite store of generated content, keyed by document hash and generation config.
+
+    Summary and key points are stored per artifact; flashcards and quiz
+    questions are stored one row per item so that regenerating or adding an
+    item writes only that item. Lookups by document (latest artifact first)
+    are indexed. One instance is shared by every session (see
+    get_artifact_store).
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("AKADEMIYA_ARTIFACT_DB_PATH", DEFAULT_ARTIFACT_PATH)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                " document_hash TEXT NOT NULL,"
+                " config_key TEXT NOT NULL,"
+                " config TEXT NOT NULL,"
+                " summary TEXT,"
+                " key_points TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (document_hash, config_key))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                " document_hash TEXT NOT NULL,"
+                " config_key TEXT NOT NULL,"
+                " section TEXT NOT NULL,"
+                " position INTEGER NOT NULL,"
+                " data TEXT NOT NULL,"
+                " PRIMARY KEY (document_hash, config_key, section, position))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_artifacts_document_updated ON artifacts (document_hash, updated_at)"
+            )
+
+    # --- Whole Artifacts ---
+
+    def save(self, document_hash, config, sections):
+        """Stores (or replaces) every section of one artifact.
+
+        Args:
+            document_hash (str): Hash of the source PDF.
+            config (dict): Generation settings; see make_config_key.
+            sections (dict): 'summary', 'key_points', 'flashcards' and/or 'quiz'.
+
+        Returns:
+            str: The artifact's config key.
+        """
+        config_key = make_config_key(config)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO artifacts (document_hash, config_key, config, summary, key_points, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (document_hash, config_key) DO UPDATE SET"
+                " summary = excluded.summary, key_points = excluded.key_points, updated_at = excluded.updated_at",
+                (
+                    document_hash, config_key, json.dumps(config),
+                    json.dumps(sections.get("summary")), json.dumps(sections.get("key_points")), now, now
+                )
+            )
+            for section in ITEM_SECTIONS:
+                self._replace_items(document_hash, config_key, section, sections.get(section) or [])
+        return config_key
+
+    def load(self, document_hash, config_key=None):
+        """Loads an artifact: the given config, or the document's latest one.
+
+        Returns:
+            dict with 'config_key', 'config', 'updated_at' and the four
+            sections, or None if nothing is stored.
+        """
+        with self._lock:
+            if config_key is None:
+                row = self._conn.execute(
+                    "SELECT config_key, config, summary, key_points, updated_at FROM artifacts"
+                    " WHERE document_hash = ? ORDER BY updated_at DESC LIMIT 1",
+                    (document_hash,)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT config_key, config, summary, key_points, updated_at FROM artifacts"
+                    " WHERE document_hash = ? AND config_key = ?",
+                    (document_hash, config_key)
+                ).fetchone()
+            if row is None:
+                return None
+            artifact = {
+                "config_key": row[0],
+                "config": json.loads(row[1]),
+                "summary": json.loads(row[2]) if row[2] else None,
+                "key_points": json.loads(row[3]) if row[3] else None,
+                "updated_at": row[4],
+            }
+            for section in ITEM_SECTIONS:
+                rows = self._conn.execute(
+                    "SELECT data FROM items WHERE document_hash = ? AND config_key = ? AND section = ?"
+                    " ORDER BY position",
+                    (document_hash, row[0], section)
+                ).fetchall()
+                artifact[section] = [json.loads(data) for (data,) in rows] or None
+            return artifact
+
+    def exists(self, document_hash, config_key):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM artifacts WHERE document_hash = ? AND config_key = ?", (document_hash, config_key)
+            ).fetchone() is not None
+
+    # --- Partial Updates ---
+
+    def save_section(self, document_hash, config_key, section, value):
+        """Replaces one section of an existing artifact (e.g. after regenerating it)."""
+        with self._lock, self._conn:
+            if section in TEXT_SECTIONS:
+                self._conn.execute(
+                    f"UPDATE artifacts SET {section} = ? WHERE document_hash = ? AND config_key = ?",
+                    (json.dumps(value), document_hash, config_key)
+                )
+            else:
+                self._replace_items(document_hash, config_key, section, value or [])
+            self._touch(document_hash, config_key)
+
+    def update_item(self, document_hash, config_key, section, position, item):
+        """Writes back a single regenerated flashcard or quiz question."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO items (document_hash, config_key, section, position, data)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (document_hash, config_key, section, position, json.dumps(item))
+            )
+            self._touch(document_hash, config_key)
+
+    def append_items(self, document_hash, config_key, section, items):
+        """Appends newly added flashcards or quiz questions after the existing ones."""
+        with self._lock, self._conn:
+            next_position = self._conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM items"
+                " WHERE document_hash = ? AND config_key = ? AND section = ?",
+                (document_hash, config_key, section)
+            ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT INTO items (document_hash, config_key, section, position, data) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (document_hash, config_key, section, next_position + offset, json.dumps(item))
+                    for offset, item in enumerate(items)
+                ]
+            )
+            self._touch(document_hash, config_key)
+
+    # --- Export & Import ---
+
+    def export_deck(self, document_hash, config_key=None):
+        """Returns a JSON-serialisable deck for a stored artifact, or None."""
+        artifact = self.load(document_hash, config_key)
+        if artifact is None:
+            return None
+        return {
+            "format": DECK_FORMAT,
+            "version": DECK_VERSION,
+            "document_hash": document_hash,
+            "config": artifact["config"],
+            "sections": {section: artifact[section] for section in TEXT_SECTIONS + ITEM_SECTIONS},
+        }
+
+    def import_deck(self, deck):
+        """Stores a deck produced by export_deck.
+
+        Returns:
+            tuple: (document hash, config key).
+
+        Raises:
+            ValueError: If deck is not an Akademiya deck, or its sections do
+                not have the expected shape.
+        """
+        if not isinstance(deck, dict) or deck.get("format") != DECK_FORMAT or not deck.get("document_hash"):
+            raise ValueError("Not an Akademiya deck file.")
+        if deck.get("version") != DECK_VERSION:
+            raise ValueError(f"Unsupported deck version: {deck.get('version')}")
+        sections = deck.get("sections")
+        if not isinstance(sections, dict):
+            raise ValueError("The deck's sections must be an object.")
+        unknown = set(sections) - set(TEXT_SECTIONS + ITEM_SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown deck sections: {', '.join(sorted(unknown))}")
+        present = {section: value for section, value in sections.items() if value is not None}
+        for section in ITEM_SECTIONS:
+            if section in present and not isinstance(present[section], list):
+                raise ValueError(f"The deck's {section} must be a list.")
+        if "key_points" in present and not isinstance(present["key_points"], list):
+            raise ValueError("The deck's key_points must be a list.")
+        validated, report = response_schema.validate_payload(present)
+        if report["dropped"] or report["removed_sections"]:
+            raise ValueError(f"The deck has {report['dropped']} malformed item(s) or empty section(s).")
+        sections = validated
+        config_key = self.save(deck["document_hash"], deck.get("config") or {}, sections)
+        return deck["document_hash"], config_key
+
+    # --- Internal Helpers ---
+
+    def _replace_items(self, document_hash, config_key, section, items):
+        # Caller holds the lock and an open transaction
+        self._conn.execute(
+            "DELETE FROM items WHERE document_hash = ? AND config_key = ? AND section = ?",
+            (document_hash, config_key, section)
+        )
+        self._conn.executemany(
+            "INSERT INTO items (document_hash, config_key, section, position, data) VALUES (?, ?, ?, ?, ?)",
+            [(document_hash, config_key, section, position, json.dumps(item)) for position, item in enumerate(items)]
+        )
+
+    def _touch(self, document_hash, config_key):
+        self._conn.execute(
+            "UPDATE artifacts SET updated_at = ? WHERE document_hash = ? AND config_key = ?",
+            (time.time(), document_hash, config_key)
+        )
+
+
+def get_artifact_store():
+    """Returns the process-wide ArtifactStore, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
@@ -0,0 +1,211 @@
+"""Headless batch generation for a folder of PDFs.
+
+Runs the same pipeline as the app (budgeted extraction and cleaning,
+construct_prompt, get_gpt_response, parse_json_response) for every PDF under
+a directory and writes one JSON file per document. Documents whose output
+already exists for the same file contents and settings are skipped, so an
+interrupted run picks up where it stopped.
+
+    python batch.py course_pdfs/ study_material/ --workers 4 --max-requests 4
+    python batch.py course_pdfs/ study_material/ --types Summary Flashcards --focus "exam topics"
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import utils
+import token_budget
+import pdf_extraction
+
+# --- Default Constants ---
+DEFAULT_WORKERS = 4  # Documents processed at once
+DEFAULT_MAX_REQUESTS = 4  # Generation requests in flight at once
+CONTENT_TYPES = ["Summary", "Key Points", "Flashcards", "Quiz"]
+HASH_CHUNK_BYTES = 1024 * 1024
+
+logger = logging.getLogger("akademiya.batch")
+
+
+# --- Inputs & Outputs ---
+
+def find_pdfs(input_dir):
+    """Returns every .pdf under input_dir, sorted for a stable processing order."""
+    found = []
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            if name.lower().endswith(".pdf"):
+                found.append(os.path.join(root, name))
+    return sorted(found)
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def output_path_for(pdf_path, input_dir, output_dir):
+    relative = os.path.relpath(pdf_path, input_dir)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + ".json")
+
+
+def is_done(output_path, settings):
+    """True if output_path holds a result produced with exactly these settings."""
+    try:
+        with open(output_path, encoding="utf-8") as f:
+            existing = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return existing.get("settings") == settings and existing.get("result") is not None
+
+
+def write_json_atomic(path, payload):
+    # Written to a temp file and renamed, so an interrupted run never leaves a partial output
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# --- Pipeline ---
+
+def process_document(client, pdf_path, output_path, base_settings, request_slots):
+    """Runs the pipeline for one PDF and writes its JSON output.
+
+    The file's hash and base_settings decide whether an existing output can
+    be reused.
+
+    Returns:
+        str: 'done' or 'skipped'.
+
+    Raises:
+        RuntimeError: If extraction, the API call or parsing fails.
+    """
+    settings = dict(base_settings, sha256=hash_file(pdf_path))
+    if is_done(output_path, settings):
+        return "skipped"
+
+    extracted = pdf_extraction.extract_with_budget(
+        pdf_path, max_tokens=settings["max_input_tokens"], model=settings["model"]
+    )
+    if not extracted["text"]:
+        raise RuntimeError("no text could be extracted")
+
+    system_prompt = utils.construct_prompt(settings["content_types"], focus_instruction=settings["focus"])
+    # Extraction runs on every worker; only the API calls are bounded
+    with request_slots:
+        response_text = utils.get_gpt_response(
+            client, extracted["text"], system_prompt,
+            model=settings["model"], temperature=settings["temperature"]
+        )
+    if not response_text:
+        raise RuntimeError("no response from the API")
+    parsed = utils.parse_json_response(response_text)
+    if parsed is None:
+        raise RuntimeError("the API response could not be parsed")
+    requested = {
+        section: None for section, label in utils.SECTION_LABELS.items() if label in settings["content_types"]
+    }
+    if utils.missing_sections(parsed, requested):
+        # A cut-off response keeps what arrived whole; one short follow-up fills the rest
+        with request_slots:
+            parsed, _ = utils.complete_response(
+                client, extracted["text"], parsed, requested, settings["focus"],
+                model=settings["model"], temperature=settings["temperature"]
+            )
+
+    write_json_atomic(output_path, {
+        "source": os.path.abspath(pdf_path),
+        "settings": settings,
+        "page_count": extracted["page_count"],
+        "truncated_at_page": extracted["truncated_at_page"],
+        "input_tokens": extracted["token_count"],
+        "boilerplate_tokens_saved": extracted["boilerplate_tokens_saved"],
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "result": parsed,
+    })
+    return "done"
+
+
+# --- Entry Point ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate study material for every PDF in a directory.")
+    parser.add_argument("input_dir", help="Directory searched (recursively) for PDFs.")
+    parser.add_argument("output_dir", help="Directory for the per-document JSON files.")
+    parser.add_argument("--types", nargs="+", choices=CONTENT_TYPES, default=CONTENT_TYPES, help="Content types to generate.")
+    parser.add_argument("--focus", default=None, help="Optional focus instruction for every document.")
+    parser.add_argument("--model", default=utils.DEFAULT_MODEL)
+    parser.add_argument("--temperature", type=float, default=utils.DEFAULT_TEMP)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Documents processed at once.")
+    parser.add_argument("--max-requests", type=int, default=DEFAULT_MAX_REQUESTS, help="API requests in flight at once.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    client = utils.initialize_openai_client()
+    if client is None:
+        logger.error("No OpenAI client; set OPENAI_API_KEY.")
+        return 2
+
+    pdf_paths = find_pdfs(args.input_dir)
+    if not pdf_paths:
+        logger.error("No PDFs found under %s", args.input_dir)
+        return 2
+
+    request_slots = threading.BoundedSemaphore(max(1, args.max_requests))
+    failures = {}
+    counts = {"done": 0, "skipped": 0}
+
+    settings = {
+        "content_types": args.types,
+        "focus": args.focus,
+        "model": args.model,
+        "temperature": args.temperature,
+        "max_input_tokens": token_budget.get_input_token_budget(),
+    }
+
+    executor = ThreadPoolExecutor(max_workers=max(1, args.workers))
+    try:
+        futures = {}
+        for pdf_path in pdf_paths:
+            output_path = output_path_for(pdf_path, args.input_dir, args.output_dir)
+            futures[executor.submit(process_document, client, pdf_path, output_path, settings, request_slots)] = pdf_path
+
+        for finished, future in enumerate(as_completed(futures), start=1):
+            pdf_path = futures[future]
+            try:
+                outcome = future.result()
+                counts[outcome] += 1
+                logger.info("[%d/%d] %s %s", finished, len(futures), outcome, pdf_path)
+            except Exception as e:
+                failures[pdf_path] = str(e)
+                logger.error("[%d/%d] failed %s: %s", finished, len(futures), pdf_path, e)
+    except KeyboardInterrupt:
+        # Finished documents are already on disk; the rest are picked up by the next run
+        logger.warning("Interrupted; rerun the same command to resume.")
+        executor.shutdown(wait=False, cancel_futures=True)
+        return 130
+    executor.shutdown()
+
+    logger.info("%d generated, %d already up to date, %d failed", counts["done"], counts["skipped"], len(failures))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""Headless end-to-end benchmark of the generation pipeline.
+
+Runs extraction, cleaning, prompt construction, the API call and JSON parsing
+against a local fake OpenAI server for test.pdf and synthetically enlarged
+copies of it, then reports per-stage latency percentiles, throughput and peak
+memory. With --baseline the run fails if any stage's p95 regressed.
+
+    python benchmark.py --sizes 1 4 16 --iterations 5 --latency 0.2
+    python benchmark.py --save baseline.json
+    python benchmark.py --baseline baseline.json --tolerance 0.25
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import threading
+import tracemalloc
+
+import fitz  # PyMuPDF
+
+import fake_openai_server
+
+DEFAULT_PDF = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test.pdf")
+STAGES = ["extract", "clean", "construct_prompt", "get_gpt_response", "parse_json_response"]
+CONTENT_TYPES = ["Summary", "Key Points", "Flashcards", "Quiz"]
+
+
+# --- Inputs ---
+
+def build_enlarged_pdf(source_path, copies):
+    """Returns the bytes of a PDF made of `copies` back-to-back copies of source_path."""
+    with fitz.open(source_path) as source, fitz.open() as enlarged:
+        for _ in range(copies):
+            enlarged.insert_pdf(source)
+        return enlarged.tobytes(), enlarged.page_count
+
+
+# --- Pipeline ---
+
+def run_pipeline(pdf_bytes, client):
+    """Runs the pipeline once and returns {stage: seconds}, or raises on failure."""
+    # Imported here so OPENAI_BASE_URL is set before any client is built
+    import utils
+    import pdf_extraction
+    import token_budget
+
+    timings = {}
+
+    # Extraction stops at the token budget, as in the app; pages past it are never read
+    start = time.perf_counter()
+    extraction = pdf_extraction.extract_with_budget(
+        pdf_bytes, max_tokens=token_budget.get_input_token_budget(), model=utils.DEFAULT_MODEL
+    )
+    timings["extract"] = time.perf_counter() - start
+
+    # Cleaning already happened page by page during extraction; only the final whitespace pass is timed
+    start = time.perf_counter()
+    cleaned_text = pdf_extraction.clean_extracted_text(extraction["text"])
+    timings["clean"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    system_prompt = utils.construct_prompt(CONTENT_TYPES)
+    timings["construct_prompt"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # Bypass the response cache so every iteration measures a real round trip
+    response_text = utils.get_gpt_response(client, cleaned_text, system_prompt, use_cache=False)
+    timings["get_gpt_response"] = time.perf_counter() - start
+    if not response_text:
+        raise RuntimeError("get_gpt_response returned no content")
+
+    start = time.perf_counter()
+    parsed = utils.parse_json_response(response_text)
+    timings["parse_json_response"] = time.perf_counter() - start
+    if parsed is None:
+        raise RuntimeError("parse_json_response failed")
+
+    return timings
+
+
+def benchmark_size(pdf_bytes, page_count, client, iterations, warmup):
+    """Benchmarks one document size; returns a result dict for the report."""
+    from instrumentation import percentile
+    import pdf_extraction
+
+    # Untimed: what extraction kept, so a size that silently loses its content shows up
+    extraction = pdf_extraction.extract_with_budget(pdf_bytes)
+
+    for _ in range(warmup):
+        run_pipeline(pdf_bytes, client)
+
+    per_stage = {stage: [] for stage in STAGES}
+    totals = []
+    wall_start = time.perf_counter()
+    for _ in range(iterations):
+        timings = run_pipeline(pdf_bytes, client)
+        for stage, seconds in timings.items():
+            per_stage[stage].append(seconds * 1000.0)
+        totals.append(sum(timings.values()) * 1000.0)
+    wall_seconds = time.perf_counter() - wall_start
+
+    # One extra traced run: tracemalloc slows allocation, so it is kept out of the timings
+    tracemalloc.start()
+    run_pipeline(pdf_bytes, client)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "pages": page_count,
+        "bytes": len(pdf_bytes),
+        "words": extraction["word_count"],
+        "boilerplate_lines_removed": extraction["boilerplate_lines_removed"],
+        "iterations": iterations,
+        "docs_per_second": iterations / wall_seconds,
+        "pages_per_second": iterations * page_count / wall_seconds,
+        "total_p50_ms": percentile(totals, 0.50),
+        "total_p95_ms": percentile(totals, 0.95),
+        "stages": {
+            stage: {"p50_ms": percentile(values, 0.50), "p95_ms": percentile(values, 0.95)}
+            for stage, values in per_stage.items()
+        },
+        "peak_python_mb": peak_bytes / (1024 * 1024),
+    }
+
+
+# --- Reporting ---
+
+def print_report(results):
+    for label, result in results.items():
+        print(f"\n== {label}: {result['pages']} pages, {result['bytes'] / 1024:.0f} KiB ==")
+        print(f"  extracted: {result['words']} words, {result['boilerplate_lines_removed']} boilerplate lines removed")
+        print(f"  throughput: {result['docs_per_second']:.2f} docs/s, {result['pages_per_second']:.1f} pages/s")
+        print(f"  end-to-end: p50 {result['total_p50_ms']:.1f} ms, p95 {result['total_p95_ms']:.1f} ms")
+        print(f"  peak Python memory: {result['peak_python_mb']:.1f} MiB")
+        for stage, stats in result["stages"].items():
+            print(f"    {stage:<22} p50 {stats['p50_ms']:>9.2f} ms   p95 {stats['p95_ms']:>9.2f} ms")
+    # ru_maxrss is KiB on Linux
+    print(f"\nProcess peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+
+
+def find_regressions(results, baseline, tolerance):
+    """Lists stages whose p95 exceeds the baseline's by more than tolerance."""
+    regressions = []
+    for label, result in results.items():
+        base = baseline.get(label)
+        if not base:
+            continue
+        for stage, stats in result["stages"].items():
+            base_p95 = base["stages"].get(stage, {}).get("p95_ms")
+            if base_p95 and stats["p95_ms"] > base_p95 * (1 + tolerance):
+                regressions.append(f"{label} {stage}: p95 {stats['p95_ms']:.2f} ms vs baseline {base_p95:.2f} ms")
+    return regressions
+
+
+# --- Entry Point ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Akademiya pipeline against a fake OpenAI server.")
+    parser.add_argument("--pdf", default=DEFAULT_PDF, help="Source PDF (default: test.pdf).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16], help="Copies of the source PDF per size.")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake API latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random fake API latency in seconds.")
+    parser.add_argument("--save", help="Write results as JSON to this file.")
+    parser.add_argument("--baseline", help="Fail if any stage p95 regressed against this JSON file.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 slowdown vs baseline (0.2 = 20%%).")
+    args = parser.parse_args(argv)
+
+    server = fake_openai_server.serve(port=0, latency=args.latency, jitter=args.jitter)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+    import utils
+    client = utils.initialize_openai_client()
+    if client is None:
+        print("Could not create an OpenAI client.", file=sys.stderr)
+        return 2
+
+    results = {}
+    try:
+        for copies in args.sizes:
+            pdf_bytes, page_count = build_enlarged_pdf(args.pdf, copies)
+            results[f"x{copies}"] = benchmark_size(pdf_bytes, page_count, client, args.iterations, args.warmup)
+    finally:
+        server.shutdown()
+
+    print_report(results)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions:", *regressions, sep="\n  ")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Micro-benchmark of response decoding and validation for large decks.
+
+Times, per deck size: decoding with the json module, decoding with orjson
+(when installed), and response_schema.validate_payload on the decoded deck.
+A few malformed items are mixed in so the repair and drop paths are timed
+too.
+
+    python benchmark_parsing.py --sizes 50 500 5000 --iterations 20
+"""
+import sys
+import json
+import time
+import argparse
+
+import response_schema
+
+MALFORMED_EVERY = 25  # One malformed or repairable item per this many
+
+
+# --- Inputs ---
+
+def build_deck(size):
+    """Returns the JSON text of a response with `size` flashcards and quiz questions."""
+    flashcards = []
+    quiz = []
+    for i in range(size):
+        flashcards.append({"question": f"What does term {i} mean in context {i % 17}?", "answer": f"Term {i} means" + " detail" * 12})
+        question = {
+            "question": f"Which statement about concept {i} is correct?",
+            "options": {"a": f"Statement A{i}", "b": f"Statement B{i}", "c": f"Statement C{i}", "d": f"Statement D{i}"},
+            "answer": "b",
+        }
+        if i % MALFORMED_EVERY == 1:
+            # Repairable: list options and an "B)" style answer
+            question["options"] = list(question["options"].values())
+            question["answer"] = "B)"
+        elif i % MALFORMED_EVERY == 2:
+            del question["options"]
+        quiz.append(question)
+    payload = {
+        "summary": "A summary paragraph. " * 40,
+        "key_points": [{"point": f"Point {i}", "description": "Why it matters. " * 3} for i in range(min(size, 50))],
+        "flashcards": flashcards,
+        "quiz": quiz,
+    }
+    return json.dumps(payload)
+
+
+# --- Timing ---
+
+def time_call(fn, arg, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(arg)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    timings.sort()
+    return {"p50_ms": timings[len(timings) // 2], "min_ms": timings[0]}
+
+
+def benchmark_size(size, iterations):
+    text = build_deck(size)
+    decoded = json.loads(text)
+    results = {"json.loads": time_call(json.loads, text, iterations)}
+    if response_schema.orjson is not None:
+        results["orjson.loads"] = time_call(response_schema.orjson.loads, text, iterations)
+    results["validate_payload"] = time_call(response_schema.validate_payload, decoded, iterations)
+    _, report = response_schema.validate_payload(decoded)
+    return len(text), results, report
+
+
+# --- Entry Point ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark response decoding and schema validation.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000], help="Flashcards and quiz questions per deck.")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if response_schema.orjson is None:
+        print("orjson is not installed; only the json module is timed.")
+    for size in args.sizes:
+        length, results, report = benchmark_size(size, args.iterations)
+        print(f"\n== {size} items per section, {length / 1024:.0f} KiB ==")
+        for name, stats in results.items():
+            print(f"  {name:<18} p50 {stats['p50_ms']:>9.3f} ms   min {stats['min_ms']:>9.3f} ms")
+        print(f"  validation: {report['repaired']} repaired, {report['dropped']} dropped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
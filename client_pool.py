@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
+
+# --- Default Constants ---
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 60.0  # Seconds an idle connection is kept open
+DEFAULT_TIMEOUT = 120.0  # Generation calls on long documents can be slow
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_HEALTH_CHECK_INTERVAL = 300.0  # Seconds between health checks
+HEALTH_CHECK_TIMEOUT = 5.0
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class ClientPool:
+    """Owns the process-wide OpenAI client and its keep-alive connection pool.
+
+    Every session and page shares one client, so TLS connections are reused
+    across reruns instead of being re-established per interaction. The
+    client is health-checked at most every health_check_interval seconds
+    (and immediately after mark_unhealthy) and rebuilt if the check fails.
+    """
+
+    def __init__(self, api_key, max_connections=None, max_keepalive_connections=None,
+                 keepalive_expiry=None, timeout=None, connect_timeout=None, health_check_interval=None):
+        self.api_key = api_key
+        self.limits = httpx.Limits(
+            max_connections=int(max_connections or _env_float("OPENAI_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+            max_keepalive_connections=int(max_keepalive_connections or _env_float(
+                "OPENAI_MAX_KEEPALIVE_CONNECTIONS", DEFAULT_MAX_KEEPALIVE_CONNECTIONS)),
+            keepalive_expiry=keepalive_expiry or _env_float("OPENAI_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY)
+        )
+        self.timeout = httpx.Timeout(
+            timeout or _env_float("OPENAI_TIMEOUT", DEFAULT_TIMEOUT),
+            connect=connect_timeout or _env_float("OPENAI_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)
+        )
+        self.health_check_interval = health_check_interval or _env_float(
+            "OPENAI_HEALTH_CHECK_INTERVAL", DEFAULT_HEALTH_CHECK_INTERVAL)
+        self.healthy = True
+        self._check_due = False
+        self._client = None
+        self._last_health_check = 0.0
+        self._lock = threading.Lock()
+
+    def get_client(self):
+        """Returns the shared OpenAI client, building or replacing it if needed.
+
+        A due health check runs on the calling thread but outside the lock;
+        other callers meanwhile get the current client rather than waiting.
+        """
+        with self._lock:
+            if self._client is None:
+                self._client = self._build_client()
+                self._last_health_check = time.monotonic()
+                return self._client
+            if not (self._check_due or time.monotonic() - self._last_health_check >= self.health_check_interval):
+                return self._client
+            # Claim the check so concurrent callers don't run it too
+            self._last_health_check = time.monotonic()
+            self._check_due = False
+            client = self._client
+        return self._check_health(client)
+
+    def new_async_client(self):
+        """Returns a new AsyncOpenAI client with the same limits and timeouts.
+
+        Async connection pools are bound to the event loop that uses them, so
+        async clients are created per asyncio.run() rather than shared.
+        """
+        return AsyncOpenAI(
+            api_key=self.api_key,
+            timeout=self.timeout,
+            max_retries=0, # Retries are handled by rate_limiter
+            http_client=DefaultAsyncHttpxClient(limits=self.limits, timeout=self.timeout)
+        )
+
+    def mark_unhealthy(self):
+        """Forces a health check (and rebuild on failure) on the next get_client."""
+        self._check_due = True
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    # --- Internal Helpers ---
+
+    def _build_client(self):
+        return OpenAI(
+            api_key=self.api_key,
+            timeout=self.timeout,
+            max_retries=0, # Retries are handled by rate_limiter
+            http_client=DefaultHttpxClient(limits=self.limits, timeout=self.timeout)
+        )
+
+    def _check_health(self, client):
+        # Called without the lock. A cheap authenticated request over the pooled connections.
+        try:
+            client.with_options(timeout=HEALTH_CHECK_TIMEOUT, max_retries=0).models.list()
+            healthy = True
+        except Exception:
+            healthy = False
+        with self._lock:
+            self.healthy = healthy
+            if not healthy and self._client is client:
+                # Other sessions may still be mid-request on the old client, so it is
+                # dropped rather than closed; its connections are released when collected.
+                self._client = self._build_client()
+            return self._client
+
+
+def get_client_pool(api_key):
+    """Returns the process-wide ClientPool, recreating it if the API key changed."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.api_key != api_key:
+            if _pool is not None:
+                _pool.close()
+            _pool = ClientPool(api_key)
+        return _pool
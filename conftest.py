@@ -0,0 +1 @@
+# Keeps the repository root importable from tests/ (pytest adds a conftest's directory to sys.path)
@@ -0,0 +1,76 @@
+import re
+
+# --- Default Constants ---
+DEFAULT_SIMILARITY_THRESHOLD = 0.6  # Jaccard similarity from which two questions count as the same
+
+TERM_RE = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset(
+    "a an and are as at be by do does for from has have in is it its of on or that the this to was were "
+    "what which who why how when where with".split()
+)
+
+
+def shingles(question):
+    """Normalized word and word-pair shingles of a question.
+
+    Case, punctuation, stopwords and a trailing plural 's' are ignored, so
+    "What is a cell?" and "what are cells" share every shingle.
+    """
+    terms = [
+        term[:-1] if len(term) > 3 and term.endswith("s") else term
+        for term in TERM_RE.findall(str(question).lower())
+        if term not in STOPWORDS
+    ]
+    result = set(terms)
+    result.update(f"{a} {b}" for a, b in zip(terms, terms[1:]))
+    return frozenset(result)
+
+
+def similarity(a, b):
+    """Jaccard similarity of two shingle sets (0.0 when both are empty)."""
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class QuestionIndex:
+    """Local near-duplicate detector for flashcard and quiz questions.
+
+    Keeps the shingle set of every accepted question and an inverted index
+    from shingle to questions, so a new question is only compared with
+    questions it shares at least one shingle with.
+    """
+
+    def __init__(self, questions=(), threshold=DEFAULT_SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self._shingles = []
+        self._postings = {}
+        for question in questions:
+            self.add(question)
+
+    def find_duplicate(self, question):
+        """Returns the most similar indexed question at or above the threshold, or None."""
+        candidate = shingles(question)
+        if not candidate:
+            return None
+        seen = set()
+        best, best_score = None, 0.0
+        for shingle in candidate:
+            for position in self._postings.get(shingle, ()):
+                if position in seen:
+                    continue
+                seen.add(position)
+                score = similarity(candidate, self._shingles[position][1])
+                if score > best_score:
+                    best, best_score = self._shingles[position][0], score
+        return best if best_score >= self.threshold else None
+
+    def is_duplicate(self, question):
+        return self.find_duplicate(question) is not None
+
+    def add(self, question):
+        position = len(self._shingles)
+        question_shingles = shingles(question)
+        self._shingles.append((question, question_shingles))
+        for shingle in question_shingles:
+            self._postings.setdefault(shingle, []).append(position)
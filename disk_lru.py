@@ -0,0 +1,51 @@
+import os
+
+
+def directory_entries(directory, suffix):
+    """Lists the files in directory ending in suffix.
+
+    Returns:
+        list: (mtime, path, size) per file; files removed meanwhile are skipped.
+    """
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith(suffix):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, path, stat.st_size))
+    return entries
+
+
+def evict_oldest(directory, suffix, max_bytes, keep=None):
+    """Deletes the least recently modified files until the total is within max_bytes.
+
+    Readers refresh a file's mtime (os.utime) when they use it, so mtime
+    order is least recently used order. Callers serialise calls with their
+    own lock.
+
+    Args:
+        directory (str): Directory to trim.
+        suffix (str): Only files ending in this are counted and removed.
+        max_bytes (int): Size bound for those files.
+        keep (str, optional): Path that is never removed (e.g. the file just written).
+
+    Returns:
+        int: Total size of the files left.
+    """
+    entries = sorted(directory_entries(directory, suffix))
+    total = sum(size for _, _, size in entries)
+    for _, path, size in entries:
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            continue
+    return total
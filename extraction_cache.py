@@ -0,0 +1,95 @@
+import os
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+
+import disk_lru
+
+# --- Default Constants ---
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "akademiya_extraction_cache")
+DEFAULT_MEMORY_ENTRIES = 32  # Documents kept in the in-memory LRU tier
+DEFAULT_DISK_BYTES = 256 * 1024 * 1024  # Size bound for the on-disk tier
+
+
+class ExtractionCache:
+    """Two-tier, content-addressed cache for cleaned PDF text.
+
+    The first tier is an in-memory LRU of recently used documents. The second
+    tier is a directory of JSON files, one per document hash, which is trimmed
+    (least recently used first) whenever its total size exceeds the bound.
+    Both tiers are shared by every session in the process.
+    """
+
+    def __init__(self, cache_dir=None, max_memory_entries=None, max_disk_bytes=None):
+        self.cache_dir = cache_dir or os.getenv("AKADEMIYA_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_memory_entries = max_memory_entries or DEFAULT_MEMORY_ENTRIES
+        self.max_disk_bytes = max_disk_bytes or DEFAULT_DISK_BYTES
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._disk_bytes = sum(size for _, _, size in disk_lru.directory_entries(self.cache_dir, ".json"))
+
+    # --- Public API ---
+
+    def get(self, content_hash):
+        """Looks up a cached extraction result.
+
+        Args:
+            content_hash (str): SHA-256 of the PDF (see UploadStore.put).
+
+        Returns:
+            dict: The cached result, or None on a miss.
+        """
+        with self._lock:
+            if content_hash in self._memory:
+                self._memory.move_to_end(content_hash)
+                return self._memory[content_hash]
+
+        path = self._path_for(content_hash)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)  # Refresh recency for disk eviction
+        except (OSError, ValueError):
+            return None
+
+        self._remember(content_hash, value)
+        return value
+
+    def put(self, content_hash, value):
+        """Stores an extraction result in both tiers.
+
+        Args:
+            content_hash (str): SHA-256 of the PDF (see UploadStore.put).
+            value (dict): JSON-serialisable result (cleaned text, word count...).
+        """
+        self._remember(content_hash, value)
+
+        path = self._path_for(content_hash)
+        payload = json.dumps(value).encode("utf-8")
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)  # Atomic, so readers never see partial files
+        except OSError:
+            return  # Disk tier is best-effort; the memory tier still holds the value
+
+        with self._lock:
+            self._disk_bytes += len(payload) - previous_size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._disk_bytes = disk_lru.evict_oldest(self.cache_dir, ".json", self.max_disk_bytes)
+
+    # --- Internal Helpers ---
+
+    def _path_for(self, content_hash):
+        return os.path.join(self.cache_dir, f"{content_hash}.json")
+
+    def _remember(self, content_hash, value):
+        with self._lock:
+            self._memory[content_hash] = value
+            self._memory.move_to_end(content_hash)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
@@ -0,0 +1,254 @@
+"""Local stand-in for the OpenAI chat completions endpoint.
+
+Serves canned JSON shaped after whatever the prompt asks for, so the
+generation pipeline (including map-reduce mode) can be exercised without an
+API key. Usage includes simulated prompt caching (cached_tokens), so prompt
+layout changes can be measured locally. Point the app at it with:
+
+    python fake_openai_server.py --port 8765
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=test streamlit run Akademiya.py
+"""
+import re
+import json
+import time
+import random
+import argparse
+import itertools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FLASHCARD_COUNT_RE = re.compile(r'Generate (\d+) flashcards')
+QUIZ_COUNT_RE = re.compile(r'Generate (\d+) multiple-choice')
+BATCH_COUNT_RE = re.compile(r'create (\d+) NEW')
+CACHE_MIN_TOKENS = 1024  # Like the real API: shorter prefixes are never cached
+CACHE_BLOCK_TOKENS = 128  # Cached prefixes grow in blocks of this many tokens
+
+_counter = itertools.count(1)
+_counter_lock = threading.Lock()
+_seen_prefixes = set()
+_seen_prefixes_lock = threading.Lock()
+
+
+def _next_id():
+    with _counter_lock:
+        return next(_counter)
+
+
+def _flashcard():
+    n = _next_id()
+    return {"question": f"Fake question {n}?", "answer": f"Fake answer {n}."}
+
+
+def _quiz_item():
+    n = _next_id()
+    return {
+        "question": f"Fake quiz question {n}?",
+        "options": {"a": f"Option A{n}", "b": f"Option B{n}", "c": f"Option C{n}"},
+        "answer": "a"
+    }
+
+
+def cached_prompt_tokens(messages):
+    """Simulates provider prompt caching: tokens of the longest prefix seen before.
+
+    Prefixes are compared at message boundaries (every message but the last),
+    which is where the app keeps its stable content.
+    """
+    cached = 0
+    prefix = ""
+    with _seen_prefixes_lock:
+        for message in messages[:-1]:
+            prefix += f"{message.get('role')}:{message.get('content', '')}\n"
+            tokens = len(prefix) // 4
+            key = hash(prefix)
+            if key in _seen_prefixes and tokens >= CACHE_MIN_TOKENS:
+                cached = tokens - tokens % CACHE_BLOCK_TOKENS
+            _seen_prefixes.add(key)
+    return cached
+
+
+def _usage(messages, content):
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_prompt_tokens(messages)},
+    }
+
+
+def build_canned_content(system_prompt, user_prompt):
+    """Returns a JSON-serialisable payload matching what the prompt requests."""
+    prompt = system_prompt + "\n" + user_prompt
+    if '"items"' in prompt:
+        match = BATCH_COUNT_RE.search(prompt)
+        make_item = _quiz_item if '"options"' in prompt else _flashcard
+        return {"items": [make_item() for _ in range(int(match.group(1)) if match else 1)]}
+    if "keys: question, options, answer" in prompt:
+        return _quiz_item()
+    if "keys: question, answer" in prompt:
+        return _flashcard()
+
+    payload = {}
+    if '"summary"' in prompt:
+        payload["summary"] = f"Fake summary of {len(user_prompt.split())} words of input."
+    if '"key_points"' in prompt:
+        payload["key_points"] = [
+            {"point": f"Fake point {_next_id()}", "description": "Fake description."} for _ in range(3)
+        ]
+    if '"flashcards"' in prompt:
+        match = FLASHCARD_COUNT_RE.search(prompt)
+        payload["flashcards"] = [_flashcard() for _ in range(int(match.group(1)) if match else 3)]
+    if '"quiz"' in prompt:
+        match = QUIZ_COUNT_RE.search(prompt)
+        payload["quiz"] = [_quiz_item() for _ in range(int(match.group(1)) if match else 3)]
+    return payload
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    # Set per server by serve()
+    latency = 0.0  # Seconds to wait before answering
+    jitter = 0.0  # Extra uniformly random seconds on top of latency
+    canned_response = None  # Fixed JSON payload to return instead of a generated one
+    truncate = None  # Fraction of each response to send, simulating cut-off output
+
+    def do_GET(self):
+        # Health checks list models
+        if not self.path.rstrip("/").endswith("/models"):
+            self.send_error(404)
+            return
+        body = json.dumps({"object": "list", "data": [{"id": "fake", "object": "model", "owned_by": "fake"}]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        messages = request.get("messages", [])
+        system_prompt = "\n".join(m.get("content", "") for m in messages if m.get("role") == "system")
+        user_prompt = "\n".join(m.get("content", "") for m in messages if m.get("role") == "user")
+
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+        payload = self.canned_response if self.canned_response is not None else build_canned_content(system_prompt, user_prompt)
+        content = json.dumps(payload)
+        finish_reason = "stop"
+        if self.truncate and "was cut off" not in user_prompt:
+            # Continuation requests are answered whole so recovery can be exercised end to end
+            content = content[:int(len(content) * self.truncate)]
+            finish_reason = "length"
+        usage = _usage(messages, content)
+        if request.get("stream"):
+            self._stream(request, content, usage, finish_reason)
+            return
+        body = json.dumps({
+            "id": f"chatcmpl-fake-{_next_id()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason
+            }],
+            "usage": usage
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, request, content, usage, finish_reason, chunk_size=16):
+        # Server-sent events in the shape of the streaming chat completions API
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        completion_id = f"chatcmpl-fake-{_next_id()}"
+        for start in range(0, len(content), chunk_size):
+            event = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [{"index": 0, "delta": {"content": content[start:start + chunk_size]}, "finish_reason": None}]
+            }
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        event = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]
+        }
+        self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            event = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [],
+                "usage": usage
+            }
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark and test output quiet
+
+
+def serve(host="127.0.0.1", port=8765, latency=0.0, jitter=0.0, canned_response=None, truncate=None):
+    """Creates the fake server. Call serve_forever() (or run it in a thread).
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind; 0 picks a free port.
+        latency (float): Seconds to wait before each response.
+        jitter (float): Extra uniformly random seconds per response.
+        canned_response (dict, optional): Fixed JSON payload for every request.
+        truncate (float, optional): Fraction of each response to send (0-1).
+
+    Returns:
+        ThreadingHTTPServer bound to (host, port).
+    """
+    handler = type("ConfiguredFakeOpenAIHandler", (FakeOpenAIHandler,), {
+        "latency": latency,
+        "jitter": jitter,
+        "canned_response": canned_response,
+        "truncate": truncate,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local fake OpenAI chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait per request.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random seconds per request.")
+    parser.add_argument("--canned", help="JSON file returned verbatim as every response's content.")
+    parser.add_argument("--truncate", type=float, default=None, help="Send only this fraction of each response (0-1).")
+    args = parser.parse_args()
+
+    canned_response = None
+    if args.canned:
+        with open(args.canned, encoding="utf-8") as f:
+            canned_response = json.load(f)
+    server = serve(args.host, args.port, args.latency, args.jitter, canned_response, args.truncate)
+    print(f"Fake OpenAI server on http://{args.host}:{server.server_port}/v1")
+    server.serve_forever()
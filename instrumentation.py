@@ -0,0 +1,198 @@
+import os
+import json
+import math
+import time
+import logging
+import tempfile
+import functools
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # Headless use (CLI, benchmarks) has no Streamlit sessions
+    get_script_run_ctx = None
+
+# --- Default Constants ---
+DEFAULT_TRACE_PATH = os.path.join(tempfile.gettempdir(), "akademiya_trace.jsonl")
+DEFAULT_TRACE_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_TRACE_BACKUPS = 3
+HEADLESS_SESSION = "headless"
+
+_current_span = contextvars.ContextVar("akademiya_current_span", default=None)
+_logger = None
+
+
+def get_trace_path():
+    """Returns the JSONL trace file path (AKADEMIYA_TRACE_PATH or default)."""
+    return os.getenv("AKADEMIYA_TRACE_PATH", DEFAULT_TRACE_PATH)
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("akademiya.trace")
+        logger.propagate = False
+        if not logger.handlers:
+            handler = RotatingFileHandler(
+                get_trace_path(), maxBytes=DEFAULT_TRACE_MAX_BYTES, backupCount=DEFAULT_TRACE_BACKUPS, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+        _logger = logger
+    return _logger
+
+
+def _session_id(parent):
+    if parent is not None:
+        return parent["session"]
+    if get_script_run_ctx is not None:
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            return ctx.session_id
+    return HEADLESS_SESSION
+
+
+def current_session_id():
+    """Session id that a span opened here would be recorded under."""
+    return _session_id(_current_span.get())
+
+
+# --- Recording ---
+
+@contextmanager
+def span(name, **attrs):
+    """Times a block and appends one JSON record to the trace file.
+
+    The record carries name, session, start timestamp, wall_ms, status and
+    any attributes given here or added inside the block with record().
+    Spans nest: a span opened inside another inherits its session and
+    records the enclosing span's name as its parent.
+    """
+    parent = _current_span.get()
+    current = {"name": name, "session": _session_id(parent), "ts": time.time(), **attrs}
+    if parent is not None:
+        current["parent"] = parent["name"]
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+        current.setdefault("status", "ok")
+    except BaseException:
+        current["status"] = "error"
+        raise
+    finally:
+        current["wall_ms"] = round((time.perf_counter() - start) * 1000.0, 3)
+        _current_span.reset(token)
+        try:
+            _get_logger().info(json.dumps(current, default=str))
+        except Exception:
+            pass  # Tracing must never break the request it measures
+
+
+def traced(name):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(**attrs):
+    """Adds attributes to the innermost open span (no-op outside a span)."""
+    current = _current_span.get()
+    if current is not None:
+        current.update(attrs)
+
+
+def record_usage(usage):
+    """Copies token counts from an OpenAI response `usage` object into the span."""
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    record(
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None),
+        cached_tokens=getattr(details, "cached_tokens", None) if details else None,
+    )
+
+
+# --- Reading & Summaries ---
+
+def read_trace(path=None):
+    """Reads every record from the trace file and its rotated backups, oldest first."""
+    path = path or get_trace_path()
+    paths = [f"{path}.{i}" for i in range(DEFAULT_TRACE_BACKUPS, 0, -1)] + [path]
+    records = []
+    for trace_path in paths:
+        try:
+            with open(trace_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+    return records
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize_by_name(records):
+    """Per-operation count, error count, p50/p95/mean wall time and token totals."""
+    groups = {}
+    for rec in records:
+        groups.setdefault(rec.get("name", "?"), []).append(rec)
+    rows = []
+    for name, group in sorted(groups.items()):
+        walls = [rec.get("wall_ms", 0.0) for rec in group]
+        rows.append({
+            "operation": name,
+            "calls": len(group),
+            "errors": sum(1 for rec in group if rec.get("status") == "error"),
+            "p50_ms": percentile(walls, 0.50),
+            "p95_ms": percentile(walls, 0.95),
+            "mean_ms": round(sum(walls) / len(walls), 3),
+            "cache_hits": sum(1 for rec in group if rec.get("cache_hit")),
+            "retries": sum(rec.get("retries") or 0 for rec in group),
+            "prompt_tokens": sum(rec.get("prompt_tokens") or 0 for rec in group),
+            "completion_tokens": sum(rec.get("completion_tokens") or 0 for rec in group),
+            "cached_tokens": sum(rec.get("cached_tokens") or 0 for rec in group),
+        })
+    return rows
+
+
+def summarize_by_session(records):
+    """Per-session call count, total wall time and token totals.
+
+    Wall time only counts outermost spans so nested operations (e.g. parsing
+    inside an add) are not double counted.
+    """
+    sessions = {}
+    for rec in records:
+        totals = sessions.setdefault(rec.get("session", HEADLESS_SESSION), {
+            "session": rec.get("session", HEADLESS_SESSION),
+            "calls": 0, "wall_ms": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+            "last_seen": 0.0,
+        })
+        if rec.get("parent") is None:
+            totals["calls"] += 1
+            totals["wall_ms"] = round(totals["wall_ms"] + rec.get("wall_ms", 0.0), 3)
+        totals["prompt_tokens"] += rec.get("prompt_tokens") or 0
+        totals["completion_tokens"] += rec.get("completion_tokens") or 0
+        totals["cached_tokens"] += rec.get("cached_tokens") or 0
+        totals["last_seen"] = max(totals["last_seen"], rec.get("ts", 0.0))
+    return sorted(sessions.values(), key=lambda totals: totals["last_seen"], reverse=True)
@@ -0,0 +1,306 @@
+import uuid
+import threading
+
+import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import jobs
+import utils
+import artifact_store
+
+# --- Default Constants ---
+OWNER_QUERY_PARAM = "sid"  # Keeps the owner id in the URL so a refresh finds its jobs
+POLL_SECONDS = 1.0
+
+_owner_sessions = {}  # Owner id -> Streamlit session currently using it
+_owner_sessions_lock = threading.Lock()
+
+
+# --- Ownership & Submission ---
+
+def get_job_owner():
+    """Returns this browser tab's job owner id.
+
+    The id lives in session state (surviving reruns and page switches) and in
+    the URL query string (surviving a browser refresh, which starts a new
+    session). An id from the URL is only taken over when no other live
+    session holds it: a refresh ends the old session first, whereas a copied
+    link opened elsewhere gets a fresh id instead of the sender's jobs.
+    """
+    owner = st.session_state.get("job_owner")
+    if owner is None:
+        requested = st.query_params.get(OWNER_QUERY_PARAM)
+        owner = requested if requested and _claim_owner(requested) else uuid.uuid4().hex
+        _claim_owner(owner)
+        st.session_state["job_owner"] = owner
+    if st.query_params.get(OWNER_QUERY_PARAM) != owner:
+        st.query_params[OWNER_QUERY_PARAM] = owner
+    return owner
+
+
+def _claim_owner(owner):
+    # Records this session as the owner id's holder; False if another live session holds it
+    ctx = get_script_run_ctx(suppress_warning=True)
+    session_id = ctx.session_id if ctx else None
+    with _owner_sessions_lock:
+        holder = _owner_sessions.get(owner)
+        if holder not in (None, session_id) and _is_live(holder):
+            return False
+        # Drop ids of sessions that have ended while we are here
+        for stale in [key for key, held_by in _owner_sessions.items() if not _is_live(held_by)]:
+            del _owner_sessions[stale]
+        _owner_sessions[owner] = session_id
+        return True
+
+
+def _is_live(session_id):
+    return session_id is not None and runtime.exists() and runtime.get_instance().is_active_session(session_id)
+
+
+def submit(kind, label, fn, *args, **kwargs):
+    """Starts fn as a background job for this tab and the current document."""
+    return jobs.get_job_runner().submit(
+        get_job_owner(), kind, label, fn, args=args, kwargs=kwargs,
+        document=st.session_state.get("document_hash")
+    )
+
+
+def has_running(kind=None, label=None):
+    """True if this tab has an unfinished job (of the given kind and label)."""
+    return any(
+        not job.finished and kind in (None, job.kind) and label in (None, job.label)
+        for job in jobs.get_job_runner().jobs_for(get_job_owner())
+    )
+
+
+# --- Saved Artifacts ---
+
+SAVED_SECTIONS = ("summary", "key_points", "flashcards", "quiz")
+
+
+def _saved_artifact():
+    # (document hash, config key) of the artifact on screen, or None before one exists
+    document_hash = st.session_state.get("document_hash")
+    config_key = st.session_state.get("artifact_key")
+    return (document_hash, config_key) if document_hash and config_key else None
+
+
+def save_artifact(config):
+    """Stores the session's sections as the artifact for its document and config."""
+    if not st.session_state.get("document_hash"):
+        return None
+    sections = {section: st.session_state.get(section) for section in SAVED_SECTIONS}
+    config_key = artifact_store.get_artifact_store().save(st.session_state["document_hash"], config, sections)
+    st.session_state["artifact_key"] = config_key
+    return config_key
+
+
+def restore_artifact(document_hash, config_key=None):
+    """Loads a stored artifact (the latest one by default) into session state.
+
+    Returns:
+        bool: True if an artifact was found.
+    """
+    artifact = artifact_store.get_artifact_store().load(document_hash, config_key)
+    if artifact is None:
+        return False
+    for section in SAVED_SECTIONS:
+        st.session_state[section] = artifact[section]
+    st.session_state["document_hash"] = document_hash
+    st.session_state["artifact_key"] = artifact["config_key"]
+    st.session_state["generation_sections"] = artifact["config"].get("sections")
+    st.session_state["content_types"] = [
+        label for section, label in utils.SECTION_LABELS.items() if artifact[section]
+    ]
+    st.session_state["gpt_response_raw"] = None
+    st.session_state["parsing_failed"] = False
+    return True
+
+
+def persist_section(section):
+    """Writes one section of the session back to its stored artifact."""
+    saved = _saved_artifact()
+    if saved:
+        artifact_store.get_artifact_store().save_section(*saved, section, st.session_state.get(section))
+
+
+def persist_item(section, index):
+    """Writes one changed flashcard or quiz question back to its stored artifact."""
+    saved = _saved_artifact()
+    if saved:
+        artifact_store.get_artifact_store().update_item(*saved, section, index, st.session_state[section][index])
+
+
+# --- Merging Results ---
+
+def _labels(sections):
+    return ", ".join(utils.SECTION_LABELS.get(section, section) for section in sections)
+
+
+def _apply_generation(result):
+    parsed = result["parsed"]
+    sections = result["sections"]
+    st.session_state['gpt_response_raw'] = result["raw"]
+    st.session_state['time_to_first_content'] = result.get("time_to_first_content")
+    st.session_state['parsing_failed'] = parsed is None
+    if parsed is None:
+        # Error details were logged by the parser; the raw response is on the Results page
+        for section in utils.SECTION_LABELS:
+            st.session_state[section] = None
+        return "warning", "Parsing failed. See the raw response on the Results page."
+
+    for section in utils.SECTION_LABELS:
+        st.session_state[section] = parsed.get(section) if section in sections or section in ("summary", "key_points") else None
+    # Stored for regeneration: the generated types and the styles/counts used
+    st.session_state['content_types'] = [
+        label for section, label in utils.SECTION_LABELS.items() if st.session_state.get(section)
+    ]
+    st.session_state['generation_sections'] = sections
+    save_artifact(artifact_store.generation_config(sections, utils.DEFAULT_MODEL, "chunk_count" in result))
+    if result.get("failed_chunks"):
+        return "warning", f"{result['failed_chunks']} of {result['chunk_count']} document parts failed and were skipped."
+    if result.get("completed_sections"):
+        return "success", f"The response was cut off; {_labels(result['completed_sections'])} completed with a short follow-up request."
+    return "success", "Content generated and parsed successfully!"
+
+
+def _apply_regenerate_all(result):
+    st.session_state['gpt_response_raw'] = result["raw"]
+    parsed = result["parsed"]
+    if parsed is None:
+        # The previous content is kept
+        st.session_state['parsing_failed'] = True
+        return "error", "Regeneration complete, but parsing the AI response failed. Your previous content was kept."
+    st.session_state['parsing_failed'] = False
+    for section in utils.SECTION_LABELS:
+        if parsed.get(section):
+            st.session_state[section] = parsed[section]
+            persist_section(section)
+    if result.get("completed_sections"):
+        return "success", f"Content regenerated; {_labels(result['completed_sections'])} completed after the response was cut off."
+    return "success", "Content regenerated successfully!"
+
+
+def _apply_section(result):
+    st.session_state[result["section"]] = result["value"]
+    persist_section(result["section"])
+    return "success", f"{utils.SECTION_LABELS.get(result['section'], result['section'])} regenerated."
+
+
+def _apply_added_items(result):
+    items = result["items"]
+    if not items:
+        return "error", "No new items could be generated."
+    st.session_state[result["section"]] = (st.session_state.get(result["section"]) or []) + items
+    saved = _saved_artifact()
+    if saved:
+        artifact_store.get_artifact_store().append_items(*saved, result["section"], items)
+    if len(items) < result["requested"]:
+        return "warning", f"Only {len(items)} of {result['requested']} requested items could be generated."
+    return "success", f"Added {len(items)} new item(s)."
+
+
+def _apply_changed_items(result):
+    items = list(st.session_state.get(result["section"]) or [])
+    changed = [index for index in result["changed"] if index < len(items)]
+    for index in changed:
+        items[index] = result["changed"][index]
+    st.session_state[result["section"]] = items
+    for index in changed:
+        persist_item(result["section"], index)
+    notices = [f"Item {index + 1} could not be changed: {error}" for index, error in sorted(result["failures"].items())]
+    if notices:
+        return "warning", "\n\n".join(notices)
+    return "success", f"Changed {len(result['changed'])} item(s)."
+
+
+APPLY_RESULT = {
+    "generate": _apply_generation,
+    "regenerate_all": _apply_regenerate_all,
+    "regenerate_section": _apply_section,
+    "add_items": _apply_added_items,
+    "regenerate_items": _apply_changed_items,
+}
+
+
+def apply_finished_jobs():
+    """Claims this tab's finished jobs and merges their results into session state.
+
+    Call near the top of a page, before it reads the sections. Results for a
+    document other than the current upload are dropped.
+
+    Returns:
+        list: (job, level, message) for each claimed job; level is 'success',
+              'warning' or 'error'.
+    """
+    runner = jobs.get_job_runner()
+    claimed = []
+    for job in runner.jobs_for(get_job_owner()):
+        if not job.finished or runner.claim(job.id) is None:
+            continue
+        if job.status == jobs.FAILED:
+            claimed.append((job, "error", f"{job.label} failed: {job.error}"))
+        elif job.document and st.session_state.get("document_hash") not in (None, job.document):
+            claimed.append((job, "warning", f"{job.label} finished for a previous upload and was discarded."))
+        else:
+            # A refreshed tab starts without a document; it adopts the job's
+            st.session_state["document_hash"] = st.session_state.get("document_hash") or job.document
+            level, message = APPLY_RESULT[job.kind](job.result)
+            claimed.append((job, level, message))
+    return claimed
+
+
+def defer_notices(claimed):
+    """Keeps notices for the next page that calls show_notices (e.g. across switch_page)."""
+    st.session_state["job_notices"] = (st.session_state.get("job_notices") or []) + [
+        (level, message) for _, level, message in claimed
+    ]
+
+
+def show_notices(claimed):
+    """Shows the outcome of claimed jobs, plus any deferred notices."""
+    notices = (st.session_state.pop("job_notices", None) or []) + [(level, message) for _, level, message in claimed]
+    for level, message in notices:
+        getattr(st, level)(message)
+
+
+# --- Progress ---
+
+def _render_partial(partial):
+    # Live preview of a streaming generation: each section/item as soon as it closes
+    if isinstance(partial.get("summary"), str):
+        st.markdown(f"**Summary:** {partial['summary']}")
+    for point in partial.get("key_points") or []:
+        if isinstance(point, dict):
+            st.markdown(f"- **{point.get('point', '-')}**: {point.get('description', '')}")
+    for i, card in enumerate(partial.get("flashcards") or []):
+        if isinstance(card, dict):
+            st.markdown(f"**Card {i + 1}:** {card.get('question', 'N/A')}")
+    for i, question in enumerate(partial.get("quiz") or []):
+        if isinstance(question, dict):
+            st.markdown(f"**Q{i + 1}:** {question.get('question', 'N/A')}")
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def _poll_jobs():
+    # Partial rerun: only this fragment refreshes while jobs are running
+    owner_jobs = jobs.get_job_runner().jobs_for(get_job_owner())
+    for job in owner_jobs:
+        st.progress(job.progress, text=f"{job.label}: {job.message or job.status}")
+        if job.partial:
+            with st.container(border=True):
+                _render_partial(job.partial)
+    if any(job.finished for job in owner_jobs):
+        # A full rerun lets the page claim and display the results
+        st.rerun()
+
+
+def show_running_jobs():
+    """Shows progress for this tab's jobs, polling only while there are any.
+
+    Jobs that finished after apply_finished_jobs ran are picked up by the
+    fragment's first poll.
+    """
+    if jobs.get_job_runner().jobs_for(get_job_owner()):
+        _poll_jobs()
@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import utils
+import notifier
+import map_reduce
+import stream_json
+import pdf_extraction
+import instrumentation
+
+# --- Default Constants ---
+DEFAULT_JOB_WORKERS = 8  # Jobs running at once across all sessions
+FINISHED_JOB_TTL_SECONDS = 3600  # Unclaimed results are dropped after this long
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+class Job:
+    """One unit of background work and everything a page needs to show it."""
+
+    def __init__(self, owner, kind, label, document=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.kind = kind
+        self.label = label
+        self.document = document  # Hash of the document the job works on
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.partial = None  # Latest partial result, for live previews
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+
+class JobRunner:
+    """Process-wide thread pool for generation, regeneration and add-item jobs.
+
+    Jobs belong to an owner id that outlives a single Streamlit session (see
+    job_panel.get_job_owner), so a page can pick up progress and results after a
+    rerun, a page switch or a browser refresh. Finished jobs are held until
+    their owner claims them, or FINISHED_JOB_TTL_SECONDS pass.
+    """
+
+    def __init__(self, max_workers=None):
+        max_workers = max_workers or int(os.getenv("AKADEMIYA_JOB_WORKERS", DEFAULT_JOB_WORKERS))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="akademiya-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    # --- Public API ---
+
+    def submit(self, owner, kind, label, fn, args=(), kwargs=None, document=None):
+        """Queues fn(report, *args, **kwargs) and returns the new job's id.
+
+        fn receives a `report(progress=None, message=None, partial=None)`
+        callback for progress updates; its return value becomes job.result
+        and any exception marks the job failed with its message.
+
+        Args:
+            owner (str): Owner id the job is listed and claimed under.
+            kind (str): Job type, used by the page to merge the result.
+            label (str): Short description shown with the progress bar.
+            fn (callable): The work; see above.
+            args (tuple), kwargs (dict): Extra arguments for fn.
+            document (str, optional): Hash of the document the job is for,
+                so stale results can be dropped after a new upload.
+
+        Returns:
+            str: The job id.
+        """
+        job = Job(owner, kind, label, document)
+        trace_session = instrumentation.current_session_id()
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        context = contextvars.copy_context()
+        self._executor.submit(context.run, self._run, job, trace_session, fn, args, kwargs or {})
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs_for(self, owner):
+        """All jobs of an owner, oldest first."""
+        with self._lock:
+            return sorted((job for job in self._jobs.values() if job.owner == owner), key=lambda job: job.created_at)
+
+    def claim(self, job_id):
+        """Removes a finished job and returns it (None if missing or still running)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.finished:
+                return None
+            return self._jobs.pop(job_id)
+
+    # --- Internal Helpers ---
+
+    def _run(self, job, trace_session, fn, args, kwargs):
+        def report(progress=None, message=None, partial=None):
+            if progress is not None:
+                job.progress = max(0.0, min(1.0, progress))
+            if message is not None:
+                job.message = message
+            if partial is not None:
+                job.partial = partial
+
+        job.status = RUNNING
+        # Spans inside the job are attributed to the session that started it
+        with instrumentation.span(f"job_{job.kind}", session=trace_session, job_id=job.id), notifier.collect() as messages:
+            try:
+                job.result = fn(report, *args, **kwargs)
+                job.progress = 1.0
+                job.status = DONE
+            except Exception as e:
+                # Errors reported along the way say more than the final exception
+                errors = [message for level, message in messages if level == "error"]
+                job.error = "; ".join(errors) if errors else (str(e) or type(e).__name__)
+                job.status = FAILED
+                instrumentation.record(status="error", error=job.error)
+        job.finished_at = time.time()
+
+    def _prune(self):
+        # Caller holds the lock
+        cutoff = time.time() - FINISHED_JOB_TTL_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+def get_job_runner():
+    """Returns the process-wide JobRunner, creating it on first use."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
+
+
+# --- Job Functions ---
+# Each runs on a pool thread and returns a plain dict for the page to merge.
+# They raise on failure so the job is marked failed with a readable message.
+
+def generate_content(report, client, text, system_prompt, sections):
+    """Single-request generation, streamed so the page can preview sections."""
+    parser = stream_json.IncrementalJSONParser()
+    expected_items = sum(int(sections.get(key) or 0) for key in ("flashcards", "quiz")) or 1
+    started_at = time.perf_counter()
+    first_content = []
+
+    def on_delta(delta):
+        if parser.feed(delta):
+            if not first_content:
+                first_content.append(time.perf_counter() - started_at)
+            items = sum(len(parser.data.get(key) or []) for key in ("flashcards", "quiz"))
+            report(progress=min(0.95, items / expected_items), message="Receiving content...", partial=dict(parser.data))
+
+    report(progress=0.0, message="Sending request to AI...")
+    response_text = utils.get_gpt_response(client, text, system_prompt, on_delta=on_delta)
+    if not response_text:
+        raise RuntimeError("Failed to get a response from the AI.")
+    parsed, completed = _parse_and_complete(report, client, text, response_text, sections)
+    return {
+        "raw": response_text,
+        "parsed": parsed,
+        "sections": sections,
+        "completed_sections": completed,
+        "time_to_first_content": first_content[0] if first_content else None,
+    }
+
+
+def _parse_and_complete(report, client, text, response_text, sections, focus_instruction=None,
+                        model=utils.DEFAULT_MODEL, temperature=utils.DEFAULT_TEMP):
+    # A cut-off response keeps what arrived whole; one short follow-up fills the rest
+    parsed = utils.parse_json_response(response_text)
+    if parsed is None or not utils.missing_sections(parsed, sections):
+        return parsed, []
+    report(progress=0.95, message="Completing a cut-off response...")
+    return utils.complete_response(client, text, parsed, sections, focus_instruction, model, temperature)
+
+
+def generate_long_document(report, client, pdf_path, fallback_text, sections, summary_style, notes_style):
+    """Map-reduce generation over the whole document.
+
+    pdf_path may be None (or vanish) if the upload was evicted; the text
+    extracted at upload time is used instead.
+    """
+    report(progress=0.0, message="Reading the full document...")
+    full_text = None
+    if pdf_path:
+        try:
+            full_text = pdf_extraction.extract_with_budget(pdf_path, map_reduce.MAX_DOCUMENT_WORDS)["text"]
+        except Exception:
+            pass
+    full_text = full_text or fallback_text
+
+    def on_chunk(done, total):
+        report(progress=0.9 * done / total, message=f"Generated {done} of {total} document parts...")
+
+    result = map_reduce.generate_map_reduce(
+        client,
+        full_text,
+        summary_style=summary_style,
+        notes_style=notes_style,
+        num_flashcards=int(sections.get("flashcards") or 0),
+        num_quiz=int(sections.get("quiz") or 0),
+        on_chunk_done=on_chunk
+    )
+    if not result:
+        raise RuntimeError("Every part of the document failed to generate.")
+    response_text = json.dumps(result)
+    return {
+        "raw": response_text,
+        "parsed": result,
+        "sections": sections,
+        "failed_chunks": result["failed_chunks"],
+        "chunk_count": result["chunk_count"],
+        "time_to_first_content": None,
+    }
+
+
+def regenerate_all(report, client, text, system_prompt, model, temperature, sections=None, focus_instruction=None):
+    """Full regeneration from the Results page; the page keeps old content on failure."""
+    report(progress=0.0, message="Regenerating content...")
+    response_text = utils.get_gpt_response(
+        client, text, system_prompt, model=model, temperature=temperature, use_cache=False
+    )
+    if not response_text:
+        raise RuntimeError("Failed to get a response from the AI.")
+    parsed, completed = _parse_and_complete(
+        report, client, text, response_text, sections or {}, focus_instruction, model, temperature
+    )
+    return {"raw": response_text, "parsed": parsed, "completed_sections": completed}
+
+
+def regenerate_section(report, client, section, text, setting, focus_instruction, model, temperature):
+    report(progress=0.0, message=f"Regenerating {utils.SECTION_LABELS.get(section, section).lower()}...")
+    value = utils.regenerate_section(client, section, text, setting, focus_instruction, model, temperature)
+    if not value:
+        raise RuntimeError(f"Could not regenerate the {utils.SECTION_LABELS.get(section, section)} section.")
+    return {"section": section, "value": value}
+
+
+def add_items(report, client, section, item_type, text, existing_items, count):
+    report(progress=0.0, message=f"Generating {count} new {item_type}(s)...")
+    new_items = utils.add_new_items(client, item_type, text, existing_items, count)
+    if new_items is None:
+        raise RuntimeError(f"Failed to generate new {item_type}s.")
+    return {"section": section, "items": new_items, "requested": count}
+
+
+def regenerate_items(report, section, item_type, text, items, indices):
+    report(progress=0.0, message=f"Asking for {len(indices)} new {item_type}(s)...")
+    updated_items, failures = utils.regenerate_items(item_type, text, items, indices)
+    if updated_items is None:
+        raise RuntimeError(f"Failed to regenerate {item_type}s.")
+    # Only the changed items travel back, so edits made meanwhile are kept
+    changed = {index: updated_items[index] for index in indices if index not in failures}
+    return {"section": section, "changed": changed, "failures": failures}
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+
+# --- Default Constants ---
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "akademiya_responses.sqlite")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600  # Responses older than this are treated as misses
+DEFAULT_MAX_ENTRIES = 5000  # Least recently used rows are evicted beyond this
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def make_cache_key(model, temperature, system_prompt, user_prompt):
+    """Returns the cache key for one chat completion request.
+
+    Args:
+        model (str): The OpenAI model name.
+        temperature (float): The generation temperature.
+        system_prompt (str): The system prompt content.
+        user_prompt (str): The user prompt content.
+
+    Returns:
+        str: Hex SHA-256 digest of the request parameters.
+    """
+    payload = json.dumps([model, float(temperature), system_prompt, user_prompt])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed cache of raw API responses with TTL and LRU eviction.
+
+    One instance is shared by every session in the process (see
+    get_response_cache). Hit and miss counts, and the API time saved by hits,
+    are tracked in memory for the lifetime of the process.
+    """
+
+    def __init__(self, path=None, ttl_seconds=None, max_entries=None):
+        self.path = path or os.getenv("AKADEMIYA_RESPONSE_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.ttl_seconds = ttl_seconds or int(os.getenv("AKADEMIYA_RESPONSE_CACHE_TTL", DEFAULT_TTL_SECONDS))
+        self.max_entries = max_entries or int(os.getenv("AKADEMIYA_RESPONSE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " latency REAL NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+
+    def get(self, key):
+        """Returns the cached response text for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, latency, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl_seconds:
+                if row is not None:
+                    with self._conn:
+                        self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            self.saved_seconds += row[1]
+            return row[0]
+
+    def put(self, key, response, latency=0.0):
+        """Stores a response, evicting least recently used rows over the bound.
+
+        Args:
+            key (str): Key from make_cache_key.
+            response (str): The raw response text.
+            latency (float): Seconds the API call took, credited on later hits.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, latency, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, response, latency, now, now)
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def stats(self):
+        """Returns hit/miss counts, hit rate, API seconds saved and entry count."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+                "entries": entries,
+            }
+
+
+def get_response_cache():
+    """Returns the process-wide ResponseCache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
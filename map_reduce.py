@@ -0,0 +1,258 @@
+import re
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import utils
+import dedupe
+import instrumentation
+import response_schema
+
+# --- Default Constants ---
+MAX_DOCUMENT_WORDS = 60000  # Upper bound on what long-document mode will read
+CHUNK_WORDS = 5000  # Words per map call, comfortably inside the single-call budget
+CHUNK_OVERLAP_WORDS = 250  # Shared context between neighbouring chunks
+MAX_CONCURRENT_CHUNKS = 4  # Map calls in flight at once
+MAX_KEY_POINTS = 10
+
+NORMALIZE_RE = re.compile(r'[^a-z0-9 ]+')
+
+
+# --- Chunking ---
+
+def split_into_chunks(text, chunk_words=CHUNK_WORDS, overlap_words=CHUNK_OVERLAP_WORDS):
+    """Splits text into overlapping word windows.
+
+    Args:
+        text (str): Cleaned document text.
+        chunk_words (int): Words per chunk.
+        overlap_words (int): Words repeated at the start of the next chunk.
+
+    Returns:
+        list: Chunk strings, in document order.
+    """
+    words = text.split()
+    if len(words) <= chunk_words:
+        return [' '.join(words)] if words else []
+    step = max(1, chunk_words - overlap_words)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(' '.join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+def spread_counts(total, chunk_count):
+    """Splits total items over chunk_count chunks as evenly as possible.
+
+    With fewer items than chunks, the items go to evenly spaced chunks
+    (first, middle, last...) rather than the first few, so the whole
+    document is still covered.
+
+    Returns:
+        list: Item count per chunk, in chunk order; sums to total.
+    """
+    if chunk_count <= 0:
+        return []
+    counts = [total // chunk_count] * chunk_count
+    remainder = total % chunk_count
+    for i in range(remainder):
+        counts[int((i + 0.5) * chunk_count / remainder)] += 1
+    return counts
+
+
+# --- Map Step ---
+
+def _map_chunk(client, chunk, system_prompt, model, temperature):
+    response_text = utils.get_gpt_response(client, chunk, system_prompt, model=model, temperature=temperature)
+    if not response_text:
+        return None
+    try:
+        parsed = response_schema.loads(response_text)
+    except ValueError:
+        return None
+    if not isinstance(parsed, dict):
+        return None
+    # Items are validated per chunk so the merge only sees canonical ones
+    parsed, _ = response_schema.validate_payload(parsed)
+    return parsed
+
+
+# --- Reduce Step ---
+
+def _normalize(text):
+    return ' '.join(NORMALIZE_RE.sub(' ', str(text).lower()).split())
+
+
+def _merge_items(per_chunk_items, key_field, limit, quotas):
+    """Deduplicates items and interleaves chunks so coverage spans the document.
+
+    Each chunk first contributes up to its quota (see spread_counts); the
+    extra items chunks were asked for then fill places left by duplicates
+    or failed chunks. Near-duplicates (e.g. from the overlap between
+    neighbouring chunks) are caught by dedupe.QuestionIndex.
+    """
+    seen = set()
+    index = dedupe.QuestionIndex()
+    queues = [list(items) if isinstance(items, list) else [] for items in per_chunk_items]
+    merged = []
+
+    def take(queue):
+        while queue:
+            item = queue.pop(0)
+            if not isinstance(item, dict) or not item.get(key_field):
+                continue
+            fingerprint = _normalize(item[key_field])
+            if fingerprint in seen or index.is_duplicate(item[key_field]):
+                continue
+            seen.add(fingerprint)
+            index.add(item[key_field])
+            return item
+        return None
+
+    for allowances in (quotas, [limit] * len(queues)):
+        taken = [0] * len(queues)
+        progressed = True
+        while progressed and len(merged) < limit:
+            progressed = False
+            for i, queue in enumerate(queues):
+                if len(merged) >= limit:
+                    break
+                if taken[i] >= allowances[i]:
+                    continue
+                item = take(queue)
+                if item is not None:
+                    merged.append(item)
+                    taken[i] += 1
+                    progressed = True
+    return merged
+
+
+def _reduce_summaries(client, summaries, summary_style, model, temperature):
+    if len(summaries) == 1:
+        return summaries[0]
+    system_prompt, _ = utils.build_generation_prompt(summary_style=summary_style)
+    joined = "\n\n".join(f"Part {i + 1}: {summary}" for i, summary in enumerate(summaries))
+    response_text = utils.get_gpt_response(
+        client,
+        "The following are summaries of consecutive parts of one document. "
+        "Combine them into a single summary of the whole document.\n\n" + joined,
+        system_prompt,
+        model=model,
+        temperature=temperature
+    )
+    if response_text:
+        try:
+            summary = response_schema.loads(response_text).get("summary")
+            if summary:
+                return summary
+        except (ValueError, AttributeError):
+            pass
+    # Fall back to the partial summaries rather than losing them
+    return "\n\n".join(summaries)
+
+
+# --- Map-Reduce Generation ---
+
+@instrumentation.traced("generate_map_reduce")
+def generate_map_reduce(client, text, summary_style=None, notes_style=None, num_flashcards=0, num_quiz=0,
+                        model=utils.DEFAULT_MODEL, temperature=utils.DEFAULT_TEMP,
+                        max_concurrency=MAX_CONCURRENT_CHUNKS, on_chunk_done=None):
+    """Generates content for a document too long for a single request.
+
+    Each overlapping chunk is sent to the API concurrently (at most
+    max_concurrency calls in flight) asking for its share of the flashcards
+    and quiz questions; when fewer are requested than there are chunks, only
+    evenly spaced chunks are asked for them (see spread_counts). Partial
+    results are then merged: summaries are combined by one short follow-up
+    call, and key points, flashcards and quiz items are deduplicated and
+    interleaved across chunks.
+
+    Args:
+        client: The initialized OpenAI client.
+        text (str): The cleaned document text.
+        summary_style, notes_style, num_flashcards, num_quiz: As for
+            utils.build_generation_prompt, for the whole document.
+        model (str): The OpenAI model to use.
+        temperature (float): The generation temperature.
+        max_concurrency (int): Maximum chunk requests in flight.
+        on_chunk_done (callable, optional): Called as on_chunk_done(done, total)
+            after each chunk finishes, for progress reporting.
+
+    Returns:
+        dict with the generated sections (same keys as the single-call JSON
+        response) plus 'chunk_count' and 'failed_chunks'; None if every
+        chunk failed.
+    """
+    chunks = split_into_chunks(text)
+    if not chunks:
+        return None
+
+    flashcard_quotas = spread_counts(num_flashcards, len(chunks))
+    quiz_quotas = spread_counts(num_quiz, len(chunks))
+    key_point_quotas = spread_counts(MAX_KEY_POINTS, len(chunks))
+    # Over-ask by one per asked chunk so deduplication can still fill the totals
+    prompts = {}
+    for fc, quiz in zip(flashcard_quotas, quiz_quotas):
+        if (fc, quiz) not in prompts:
+            prompts[(fc, quiz)] = utils.build_generation_prompt(
+                summary_style=summary_style,
+                notes_style=notes_style,
+                num_flashcards=fc + 1 if fc else 0,
+                num_quiz=quiz + 1 if quiz else 0
+            )[0]
+    # Sections of the whole result, whichever chunks were asked for items
+    _, sections = utils.build_generation_prompt(
+        summary_style=summary_style, notes_style=notes_style, num_flashcards=num_flashcards, num_quiz=num_quiz
+    )
+
+    workers = max(1, min(max_concurrency, len(chunks)))
+    done = [0]
+    done_lock = threading.Lock()
+
+    def map_one(chunk, system_prompt):
+        partial = _map_chunk(client, chunk, system_prompt, model, temperature)
+        if on_chunk_done:
+            with done_lock:
+                done[0] += 1
+                finished = done[0]
+            on_chunk_done(finished, len(chunks))
+        return partial
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Each chunk runs in a copy of the caller's context so its spans keep the session
+        contexts = [contextvars.copy_context() for _ in chunks]
+        partials = list(executor.map(
+            lambda context, chunk, fc, quiz: context.run(map_one, chunk, prompts[(fc, quiz)]),
+            contexts,
+            chunks,
+            flashcard_quotas,
+            quiz_quotas
+        ))
+
+    succeeded = [partial for partial in partials if partial]
+    if not succeeded:
+        return None
+
+    result = {
+        "chunk_count": len(chunks),
+        "failed_chunks": len(chunks) - len(succeeded),
+    }
+    if "summary" in sections:
+        summaries = [p["summary"] for p in succeeded if isinstance(p.get("summary"), str) and p["summary"].strip()]
+        if summaries:
+            result["summary"] = _reduce_summaries(client, summaries, summary_style, model, temperature)
+    # Failed chunks stay in place (as empty results) so each quota still lines up with its chunk
+    partials = [partial or {} for partial in partials]
+    if "key_points" in sections:
+        result["key_points"] = _merge_items(
+            [p.get("key_points") for p in partials], "point", MAX_KEY_POINTS, key_point_quotas
+        )
+    if "flashcards" in sections:
+        result["flashcards"] = _merge_items(
+            [p.get("flashcards") for p in partials], "question", num_flashcards, flashcard_quotas
+        )
+    if "quiz" in sections:
+        result["quiz"] = _merge_items([p.get("quiz") for p in partials], "question", num_quiz, quiz_quotas)
+    return result
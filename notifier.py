@@ -0,0 +1,60 @@
+import logging
+import contextvars
+from contextlib import contextmanager
+
+try:
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # Headless use (CLI, benchmarks) runs without Streamlit
+    st = None
+    get_script_run_ctx = None
+
+logger = logging.getLogger("akademiya")
+
+_collected = contextvars.ContextVar("akademiya_collected_messages", default=None)
+
+
+def _in_streamlit_script():
+    return get_script_run_ctx is not None and get_script_run_ctx(suppress_warning=True) is not None
+
+
+def _notify(level, message):
+    collected = _collected.get()
+    if collected is not None:
+        collected.append((level, message))
+    if _in_streamlit_script():
+        getattr(st, level)(message)
+    else:
+        logger.log(logging.ERROR if level == "error" else logging.WARNING, message)
+
+
+# --- Messages ---
+
+def error(message):
+    """Shows an error on the page when running in a Streamlit script, else logs it."""
+    _notify("error", message)
+
+
+def warning(message):
+    """Shows a warning on the page when running in a Streamlit script, else logs it."""
+    _notify("warning", message)
+
+
+def show_raw_text(label, text, key):
+    """Shows raw text (e.g. an unparseable AI response) in the page; no-op headless."""
+    if _in_streamlit_script():
+        st.text_area(label, text, height=150, key=key)
+
+
+@contextmanager
+def collect():
+    """Collects every (level, message) raised inside the block, e.g. for job errors.
+
+    Messages are still shown or logged as usual.
+    """
+    messages = []
+    token = _collected.set(messages)
+    try:
+        yield messages
+    finally:
+        _collected.reset(token)
@@ -1,5 +1,9 @@
 import streamlit as st
 import utils # Add utils import
+import json
+import jobs
+import job_panel
+import artifact_store
 # import os # Removed unused import
 # Remove unused imports if OpenAI client is gone
 # from openai import OpenAI 
@@ -12,6 +16,10 @@ st.title("Results")
 # Ensure client is initialized if utils.get_gpt_response needs it
 client = utils.initialize_openai_client() 
 
+# --- Background Jobs ---
+# Merge finished generation/regeneration jobs before the sections are read
+job_panel.show_notices(job_panel.apply_finished_jobs())
+
 # --- Retrieve Data from Session State ---
 # Use .get() with default=None for safety
 parsed_summary = st.session_state.get("summary")
@@ -99,7 +107,14 @@ focus_prompt = st.text_area(
     height=100
 )
 
-if st.button("Regenerate Content", key="regenerate_button", use_container_width=True):
+# Regenerating one section sends a smaller prompt and leaves the others as they are
+section_options = ["All sections"] + [
+    label for section, label in utils.SECTION_LABELS.items() if st.session_state.get(section)
+]
+regenerate_target = st.selectbox("What to regenerate", section_options, key="regeneration_target")
+
+regeneration_running = job_panel.has_running("regenerate_all") or job_panel.has_running("regenerate_section")
+if st.button("Regenerate Content", key="regenerate_button", use_container_width=True, disabled=regeneration_running):
     # Ensure necessary data is available
     if 'extracted_text' not in st.session_state or not st.session_state['extracted_text']:
         st.error("Cannot regenerate. Original text not found in session.")
@@ -108,58 +123,39 @@ if st.button("Regenerate Content", key="regenerate_button", use_container_width=
     elif not client:
          st.error("Cannot regenerate. OpenAI client not initialized.")
     else:
-        with st.spinner("Regenerating content based on your focus..."):
-            try:
-                # Retrieve necessary info from session state
-                original_text = st.session_state['extracted_text']
-                selected_types = st.session_state['content_types']
-                model = st.session_state.get('selected_model', utils.DEFAULT_MODEL) # Use stored or default model
-                temperature = st.session_state.get('selected_temperature', utils.DEFAULT_TEMP) # Use stored or default temp
-
-                # Construct the new prompt
-                regeneration_instruction = focus_prompt.strip()
-                system_prompt = utils.construct_prompt( 
-                    selected_types,
-                    focus_instruction=regeneration_instruction if regeneration_instruction else None
-                )
-
-                # Call the API with correct arguments
-                new_response_raw = utils.get_gpt_response(
-                    client, 
-                    user_prompt=original_text,
-                    system_prompt_content=system_prompt,
-                    model=model, 
-                    temperature=temperature
-                )
-                st.session_state['gpt_response_raw'] = new_response_raw # Store raw response again
-
-                # Parse the new response - parse_json_response now returns None on failure
-                parsed_data = utils.parse_json_response(new_response_raw)
-                
-                # Check if parsing succeeded (parsed_data is not None)
-                if parsed_data is None:
-                    st.session_state['parsing_failed'] = True
-                    # Error is already shown by parse_json_response, maybe add context
-                    st.error("Regeneration complete, but parsing the AI response failed.") 
-                    # Clear potentially outdated parsed data
-                    st.session_state['summary'] = None
-                    st.session_state['key_points'] = None
-                    st.session_state['flashcards'] = None
-                    st.session_state['quiz'] = None
-                else:
-                    st.session_state['parsing_failed'] = False
-                    # Update session state with new parsed data
-                    st.session_state['summary'] = parsed_data.get('summary')
-                    st.session_state['key_points'] = parsed_data.get('key_points')
-                    st.session_state['flashcards'] = parsed_data.get('flashcards')
-                    st.session_state['quiz'] = parsed_data.get('quiz')
-                    st.success("Content regenerated successfully!")
-                    # Rerun to immediately display the updated content
-                    st.rerun() 
-
-            except Exception as e:
-                st.error(f"An error occurred during regeneration: {e}")
-                st.session_state['parsing_failed'] = True # Mark as failed if API call fails
+        model = st.session_state.get('selected_model', utils.DEFAULT_MODEL) # Use stored or default model
+        temperature = st.session_state.get('selected_temperature', utils.DEFAULT_TEMP) # Use stored or default temp
+        if regenerate_target != "All sections":
+            section = next(key for key, label in utils.SECTION_LABELS.items() if label == regenerate_target)
+            # Reuse the style/count chosen on the Configure page; fall back to the current item count
+            setting = (st.session_state.get('generation_sections') or {}).get(section)
+            if not setting and section in ("flashcards", "quiz"):
+                setting = len(st.session_state.get(section) or [])
+            # Only this section is merged when the job finishes; the others are untouched
+            job_panel.submit(
+                "regenerate_section", f"Regenerating {regenerate_target.lower()}", jobs.regenerate_section,
+                client, section, st.session_state['extracted_text'], setting, focus_prompt, model, temperature
+            )
+        else:
+            # Construct the new prompt
+            selected_types = st.session_state['content_types']
+            regeneration_instruction = focus_prompt.strip()
+            system_prompt = utils.construct_prompt( 
+                selected_types,
+                focus_instruction=regeneration_instruction if regeneration_instruction else None
+            )
+            # Counts are not fixed on this path, so a cut-off response is only completed for empty sections
+            regenerated_sections = {
+                section: None for section, label in utils.SECTION_LABELS.items() if label in selected_types
+            }
+            job_panel.submit(
+                "regenerate_all", "Regenerating content", jobs.regenerate_all,
+                client, st.session_state['extracted_text'], system_prompt, model, temperature,
+                regenerated_sections, regeneration_instruction or None
+            )
+        st.rerun()
+
+job_panel.show_running_jobs()
 
 # --- Display Raw Response if Parsing Failed ---
 if parsing_failed and raw_response:
@@ -169,6 +165,35 @@ if parsing_failed and raw_response:
     # Use text_area for potentially long raw output
     st.text_area("Raw Output", raw_response, height=300, disabled=True, label_visibility="collapsed")
 
+# --- Export & Import ---
+with st.expander("Export / Import Deck"):
+    store = artifact_store.get_artifact_store()
+    if st.session_state.get("document_hash") and st.session_state.get("artifact_key"):
+        deck = store.export_deck(st.session_state["document_hash"], st.session_state["artifact_key"])
+        if deck:
+            st.download_button(
+                "Download Deck (JSON)",
+                json.dumps(deck, ensure_ascii=False, indent=2),
+                file_name="akademiya_deck.json",
+                mime="application/json",
+                use_container_width=True
+            )
+    else:
+        st.caption("Generate content to export it as a deck.")
+
+    deck_file = st.file_uploader("Import a deck", type=["json"], key="deck_uploader")
+    if deck_file is not None and st.button("Import Deck", use_container_width=True):
+        try:
+            document_hash, config_key = store.import_deck(json.loads(deck_file.getvalue()))
+        except ValueError as e:
+            st.error(f"Could not import the deck: {e}")
+        else:
+            if st.session_state.get("document_hash") not in (None, document_hash):
+                st.info("The deck belongs to a different PDF; it was saved and loads when that PDF is uploaded.")
+            else:
+                job_panel.restore_artifact(document_hash, config_key)
+                st.rerun()
+
 # --- Navigation Buttons --- 
 st.divider()
 st.header("View Generated Assets")
@@ -3,6 +3,8 @@ import os
 import re
 import json
 import utils # Import the utils module
+import jobs
+import job_panel
 
 st.set_page_config(layout="centered", page_title="Flashcards")
 st.title("Generated Cards")
@@ -10,6 +12,10 @@ st.title("Generated Cards")
 # --- Initialize OpenAI Client using Utility Function ---
 client = utils.initialize_openai_client()
 
+# --- Background Jobs ---
+# Merge finished add/change jobs before the deck is read
+job_panel.show_notices(job_panel.apply_finished_jobs())
+
 # --- Get Data from Session State ---
 flashcards = st.session_state.get("flashcards")
 original_text_context = st.session_state.get("extracted_text", "")
@@ -34,26 +40,18 @@ if client: # Only show if client initialized successfully
             disabled=not can_add_more
         ) 
     with col_add_btn:
-        if st.button(f"➕ Add {num_to_add_fc} New Card(s)", key="add_new_fc_top_x", disabled=not can_add_more):
+        adding_cards = job_panel.has_running("add_items", "Adding cards")
+        if st.button(f"➕ Add {num_to_add_fc} New Card(s)", key="add_new_fc_top_x", disabled=not can_add_more or adding_cards):
             if not original_text_context:
                   st.warning("Cannot add card: Original text context missing.")
             else:
                  actual_num_to_add = min(num_to_add_fc, max_can_add)
-                 with st.spinner(f"Generating {actual_num_to_add} new card(s)..."):
-                     new_cards_added = 0
-                     for _ in range(actual_num_to_add):
-                         # Call utility function for adding
-                         new_card_data = utils.add_new_item(client, "flashcard", original_text_context, flashcards)
-                         if new_card_data:
-                              flashcards.append(new_card_data)
-                              new_cards_added += 1
-                         else:
-                              # Error message shown in util func
-                              st.error("Failed to generate one of the requested cards. Stopping addition.")
-                              break # Stop trying if one fails
-                     if new_cards_added > 0:
-                          st.session_state['flashcards'] = flashcards
-                          st.rerun()
+                 # One background request for the whole batch; the cards are appended when it finishes
+                 job_panel.submit(
+                     "add_items", "Adding cards", jobs.add_items,
+                     client, "flashcards", "flashcard", original_text_context, flashcards, actual_num_to_add
+                 )
+                 st.rerun()
 
     if not can_add_more:
          st.info(f"Maximum number of cards ({MAX_TOTAL_CARDS}) reached.")
@@ -70,6 +68,26 @@ if not flashcards or not isinstance(flashcards, list):
         st.switch_page("pages/1_Configure_Generation.py")
     st.stop()
 
+# --- Regenerate Several Cards ---
+if client:
+    with st.expander("🔄 Change Several Cards"):
+        card_numbers = list(range(1, len(flashcards) + 1))
+        change_all_cards = st.checkbox("All cards", key="change_all_fc")
+        selected_cards = card_numbers if change_all_cards else st.multiselect(
+            "Cards to change", card_numbers, key="change_selected_fc",
+            format_func=lambda n: f"Card {n}"
+        )
+        changing_cards = job_panel.has_running("regenerate_items", "Changing cards")
+        if st.button("Change Selected Cards", key="change_selected_fc_btn", disabled=not selected_cards or changing_cards):
+            # Requests run concurrently in the background; changed cards are merged when all finish
+            job_panel.submit(
+                "regenerate_items", "Changing cards", jobs.regenerate_items,
+                "flashcards", "flashcard", original_text_context, flashcards, [n - 1 for n in selected_cards]
+            )
+            st.rerun()
+
+job_panel.show_running_jobs()
+
 # --- Display Flashcards --- 
 st.header(f"Generated Flashcards ({len(flashcards)}/{MAX_TOTAL_CARDS})")
 st.divider()
@@ -98,6 +116,7 @@ else:
                     if new_card_data:
                          flashcards[i] = new_card_data
                          st.session_state["flashcards"] = flashcards
+                         job_panel.persist_item("flashcards", i)
                          st.rerun()
                      # Error messages handled within utils.regenerate_item
 
@@ -3,6 +3,8 @@ import os
 import re 
 import json
 import utils # Import the utils module
+import jobs
+import job_panel
 
 st.set_page_config(layout="centered", page_title="Quiz")
 st.title("Generated Questions") # Match wireframe title
@@ -10,6 +12,10 @@ st.title("Generated Questions") # Match wireframe title
 # --- Initialize OpenAI Client using Utility Function ---
 client = utils.initialize_openai_client()
 
+# --- Background Jobs ---
+# Merge finished add/change jobs before the quiz is read
+job_panel.show_notices(job_panel.apply_finished_jobs())
+
 # --- Get Data from Session State ---
 quiz_data = st.session_state.get("quiz") # Currently same as flashcards
 original_text_context = st.session_state.get("extracted_text", "") # Get context for helpers
@@ -44,26 +50,18 @@ if client: # Only show if client initialized
             disabled=not can_add_more_q
         )
     with col_add_btn:
-        if st.button(f"➕ Add {num_to_add} New Question(s)", key="add_new_q_top_x", disabled=not can_add_more_q):
+        adding_questions = job_panel.has_running("add_items", "Adding questions")
+        if st.button(f"➕ Add {num_to_add} New Question(s)", key="add_new_q_top_x", disabled=not can_add_more_q or adding_questions):
             if not original_text_context:
                  st.warning("Cannot add question: Original text context missing.")
             else:
                  actual_num_to_add_q = min(num_to_add, max_can_add_q)
-                 with st.spinner(f"Generating {actual_num_to_add_q} new question(s)..."):
-                     new_questions_added = 0
-                     for _ in range(actual_num_to_add_q):
-                          # Call utility function for adding
-                          new_question_data = utils.add_new_item(client, "quiz question", original_text_context, quiz_data) 
-                          if new_question_data:
-                               quiz_data.append(new_question_data)
-                               new_questions_added += 1
-                          else:
-                               # Error shown in util
-                               st.error("Failed to generate one of the requested questions. Stopping addition.")
-                               break
-                     if new_questions_added > 0:
-                          st.session_state['quiz'] = quiz_data
-                          st.rerun()
+                 # One background request for the whole batch; the questions are appended when it finishes
+                 job_panel.submit(
+                     "add_items", "Adding questions", jobs.add_items,
+                     client, "quiz", "quiz question", original_text_context, quiz_data, actual_num_to_add_q
+                 )
+                 st.rerun()
 
     if not can_add_more_q:
         st.info(f"Maximum number of questions ({MAX_TOTAL_QUESTIONS}) reached.")
@@ -72,6 +70,29 @@ elif not st.session_state.get("quiz"): # Show message if quiz hasn't been genera
     st.info("Add/Modify features disabled. API key might be missing.")
     st.divider()
 
+# --- Regenerate Several Questions ---
+if client and quiz_data:
+    with st.expander("🔄 Change Several Questions"):
+        question_numbers = list(range(1, len(quiz_data) + 1))
+        change_all_questions = st.checkbox("All questions", key="change_all_q")
+        selected_questions = question_numbers if change_all_questions else st.multiselect(
+            "Questions to change", question_numbers, key="change_selected_q",
+            format_func=lambda n: f"Q{n}"
+        )
+        changing_questions = job_panel.has_running("regenerate_items", "Changing questions")
+        if st.button("Change Selected Questions", key="change_selected_q_btn", disabled=not selected_questions or changing_questions):
+            if not original_text_context:
+                st.warning("Cannot change questions: Original text context missing.")
+            else:
+                # Requests run concurrently in the background; changed questions are merged when all finish
+                job_panel.submit(
+                    "regenerate_items", "Changing questions", jobs.regenerate_items,
+                    "quiz", "quiz question", original_text_context, quiz_data, [n - 1 for n in selected_questions]
+                )
+                st.rerun()
+
+job_panel.show_running_jobs()
+
 # --- Display Quiz --- 
 if not quiz_data:
      st.info("No quiz questions were generated.")
@@ -100,6 +121,7 @@ else:
                             if new_item_data:
                                  quiz_data[i] = new_item_data
                                  st.session_state['quiz'] = quiz_data
+                                 job_panel.persist_item("quiz", i)
                                  st.rerun()
                              # Errors handled in util
         st.markdown("--- ") # Separator between question display/change and answer radio
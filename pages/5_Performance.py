@@ -0,0 +1,65 @@
+import os
+import streamlit as st
+import instrumentation
+import llm_cache
+
+st.set_page_config(layout="centered", page_title="Performance")
+st.title("Performance")
+
+# --- Admin Gate ---
+# The panel shows every session's activity, so it is opt-in per deployment
+if os.getenv("AKADEMIYA_ADMIN") != "1":
+    st.info("The performance panel is disabled. Set AKADEMIYA_ADMIN=1 to enable it.")
+    st.stop()
+
+st.caption(f"Trace file: {instrumentation.get_trace_path()}")
+
+records = instrumentation.read_trace()
+if not records:
+    st.info("No trace records yet. Upload a PDF and generate content to collect some.")
+    st.stop()
+
+# --- Per-Operation Latency ---
+st.header("Hot Paths")
+summary_rows = instrumentation.summarize_by_name(records)
+st.dataframe(summary_rows, use_container_width=True, hide_index=True)
+
+# --- Provider Prompt Cache ---
+# Requests put the document first (utils.build_messages), so repeat calls on a document reuse its cached prefix
+st.header("Prompt Cache")
+prompt_rows = [row for row in summary_rows if row["prompt_tokens"]]
+cached_tokens = sum(row["cached_tokens"] for row in prompt_rows)
+prompt_tokens = sum(row["prompt_tokens"] for row in prompt_rows)
+col_cached, col_share = st.columns(2)
+col_cached.metric("Cached prompt tokens", f"{cached_tokens:,} / {prompt_tokens:,}")
+col_share.metric("Cached share", f"{cached_tokens / prompt_tokens:.0%}" if prompt_tokens else "n/a")
+if prompt_rows:
+    st.dataframe(
+        [
+            {
+                "operation": row["operation"],
+                "prompt_tokens": row["prompt_tokens"],
+                "cached_tokens": row["cached_tokens"],
+                "cached_share": round(row["cached_tokens"] / row["prompt_tokens"], 3),
+                "p50_ms": row["p50_ms"],
+            }
+            for row in prompt_rows
+        ],
+        use_container_width=True,
+        hide_index=True
+    )
+
+# --- Response Cache ---
+cache_stats = llm_cache.get_response_cache().stats()
+col_hits, col_rate, col_saved = st.columns(3)
+col_hits.metric("Cache hits / misses", f"{cache_stats['hits']} / {cache_stats['misses']}")
+col_rate.metric("Hit rate", f"{cache_stats['hit_rate']:.0%}")
+col_saved.metric("API time saved", f"{cache_stats['saved_seconds']:.1f}s")
+
+# --- Per-Session Totals ---
+st.header("Sessions")
+st.dataframe(instrumentation.summarize_by_session(records), use_container_width=True, hide_index=True)
+
+# --- Recent Records ---
+with st.expander("Recent records"):
+    st.json(records[-50:])
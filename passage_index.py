@@ -0,0 +1,158 @@
+import re
+import math
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+# --- Default Constants ---
+WINDOW_SENTENCES = 4  # Sentences per passage
+WINDOW_STRIDE = 2  # Sentences between passage starts (windows overlap by half)
+PASSAGE_MAX_WORDS = 80  # Windows stop growing here; longer "sentences" (bullet lists, slides) are split
+BM25_K1 = 1.5
+BM25_B = 0.75
+DEFAULT_MAX_INDEXES = 16  # Documents whose index is kept in memory
+
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+TERM_RE = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were what which "
+    "who why how when where with".split()
+)
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _terms(text):
+    return [term for term in TERM_RE.findall(text.lower()) if term not in STOPWORDS]
+
+
+def _item_text(item):
+    """Question, answer and options of a flashcard or quiz item, as one string."""
+    if not isinstance(item, dict):
+        return ""
+    parts = [str(item.get('question', '')), str(item.get('answer', ''))]
+    options = item.get('options')
+    if isinstance(options, dict):
+        parts.extend(str(value) for value in options.values())
+    return " ".join(parts)
+
+
+def _sentence_units(text, max_words):
+    """Splits text into sentences, cutting any longer than max_words words into pieces."""
+    units = []
+    for sentence in SENTENCE_RE.split(text or ""):
+        words = sentence.split()
+        for start in range(0, len(words), max_words):
+            units.append(words[start:start + max_words])
+    return units
+
+
+class PassageIndex:
+    """BM25 index over overlapping sentence windows of one document.
+
+    A window holds up to window_sentences sentences and at most max_words
+    words, so text without sentence punctuation still yields small passages.
+    """
+
+    def __init__(self, text, window_sentences=WINDOW_SENTENCES, stride=WINDOW_STRIDE, max_words=PASSAGE_MAX_WORDS):
+        # Pieces of at most half a window, so every window spans at least two and striding skips none
+        units = _sentence_units(text, max(1, max_words // 2))
+        self.passages = []
+        start = 0
+        while start < len(units):
+            end = start
+            word_count = 0
+            while end < min(len(units), start + window_sentences) and (end == start or word_count + len(units[end]) <= max_words):
+                word_count += len(units[end])
+                end += 1
+            self.passages.append(" ".join(word for unit in units[start:end] for word in unit))
+            if end >= len(units):
+                break
+            start += stride
+
+        self._term_counts = [Counter(_terms(passage)) for passage in self.passages]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        document_frequency = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        total = len(self.passages)
+        self._idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    # --- Scoring ---
+
+    def scores(self, query):
+        """BM25 score of every passage for query, in passage order."""
+        query_terms = set(_terms(query))
+        results = []
+        for counts, length in zip(self._term_counts, self._lengths):
+            score = 0.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self._avg_length) if self._avg_length else BM25_K1
+            for term in query_terms:
+                tf = counts.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+    def search(self, query, k):
+        """Returns up to k passage indices most relevant to query, best first."""
+        scores = self.scores(query)
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [i for i in ranked[:k] if scores[i] > 0]
+
+    # --- Context Selection ---
+
+    def relevant_to(self, item, k):
+        """Passages most relevant to an item being replaced, in document order.
+
+        Falls back to the least covered passages when nothing matches.
+        """
+        hits = self.search(_item_text(item), k)
+        if not hits:
+            return self.uncovered_by([], k)
+        return [self.passages[i] for i in sorted(hits)]
+
+    def uncovered_by(self, items, k):
+        """Passages least covered by existing items, in document order.
+
+        Each item marks the passages it best matches as covered; the k
+        passages with the lowest total coverage are returned, so new items
+        are drawn from parts of the document nothing has been asked about yet.
+        """
+        if not self.passages:
+            return []
+        coverage = [0.0] * len(self.passages)
+        for item in items or []:
+            item_scores = self.scores(_item_text(item))
+            best = max(item_scores) if item_scores else 0.0
+            if best <= 0:
+                continue
+            for i, score in enumerate(item_scores):
+                coverage[i] += score / best
+        # Ties go to earlier passages so the choice is stable across reruns
+        ranked = sorted(range(len(self.passages)), key=lambda i: (coverage[i], i))
+        return [self.passages[i] for i in sorted(ranked[:k])]
+
+
+def get_passage_index(text):
+    """Returns the PassageIndex for text, building it once per document.
+
+    Indexes are kept in a small process-wide LRU keyed by the text's hash,
+    so repeated regenerate/add calls on the same document reuse one index.
+    """
+    key = hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+    with _indexes_lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key]
+    index = PassageIndex(text)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > DEFAULT_MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
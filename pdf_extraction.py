@@ -0,0 +1,357 @@
+import os
+import re
+import math
+import atexit
+import tempfile
+import threading
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+import token_budget
+
+# --- Default Constants ---
+DEFAULT_MIN_PAGES_FOR_POOL = 40  # Below this the pool costs more than it saves
+CHUNKS_PER_WORKER = 2  # Smaller ranges even out pages that are slow to extract
+STREAM_BATCH_PAGES = 8  # Pages per pool task; small, so a spent budget stops scheduling soon
+BOILERPLATE_SAMPLE_PAGES = 24  # Pages sampled (evenly spread) to find repeated lines
+BOILERPLATE_MIN_PAGES = 3  # A line must repeat on at least this many sampled pages...
+BOILERPLATE_MIN_SHARE = 0.5  # ...and on at least this share of them
+POSITION_BANDS = 40  # Positions are compared on a grid of this many bands per axis
+PAGE_NUMBER_MAX_WORDS = 5  # Digits are folded only in short lines ("Page 3 of 20", "12")
+BOILERPLATE_MAX_SHARE = 0.9  # Nothing is stripped if this much of the sampled lines would be (repeated pages)
+CLEANING_VERSION = 4  # Bumped when cleaning changes, so cached extractions are redone
+
+WHITESPACE_RE = re.compile(r'\s+')
+DIGITS_RE = re.compile(r'\d+')
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+# --- Configuration ---
+
+def get_worker_count():
+    """Returns the configured number of extraction worker processes.
+
+    Reads AKADEMIYA_EXTRACT_WORKERS, defaulting to the CPU count.
+    """
+    configured = os.getenv("AKADEMIYA_EXTRACT_WORKERS")
+    if configured:
+        try:
+            return max(1, int(configured))
+        except ValueError:
+            pass
+    return os.cpu_count() or 1
+
+
+def get_min_pages_for_pool():
+    """Returns the page count from which extraction uses the process pool."""
+    configured = os.getenv("AKADEMIYA_EXTRACT_MIN_PAGES")
+    if configured:
+        try:
+            return max(1, int(configured))
+        except ValueError:
+            pass
+    return DEFAULT_MIN_PAGES_FOR_POOL
+
+
+# --- Process Pool ---
+
+def _get_pool(workers):
+    """Returns the process-wide extraction pool, (re)creating it if needed.
+
+    The pool is kept alive between uploads so worker start-up is paid once.
+    'spawn' is used because the Streamlit server process is multi-threaded.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def _shutdown_pool():
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+
+atexit.register(_shutdown_pool)
+
+
+def _extract_page_range(pdf_path, start, stop, boilerplate):
+    # Runs in a worker process: each worker opens its own document handle
+    with fitz.open(pdf_path) as doc:
+        return [_page_text(doc[i], boilerplate) for i in range(start, stop)]
+
+
+def _page_ranges(page_count, chunk_count):
+    chunk_size, remainder = divmod(page_count, chunk_count)
+    ranges = []
+    start = 0
+    for i in range(chunk_count):
+        stop = start + chunk_size + (1 if i < remainder else 0)
+        if stop > start:
+            ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def open_document(pdf_source):
+    """Opens a PDF given either its path or its raw bytes.
+
+    Paths are opened directly, so PyMuPDF reads pages from the file on
+    demand instead of from a copy of the whole document in memory.
+    """
+    if isinstance(pdf_source, (bytes, bytearray)):
+        return fitz.open(stream=pdf_source, filetype="pdf")
+    return fitz.open(pdf_source)
+
+
+def _iter_raw_pages(pdf_source, workers, ranges, window, boilerplate):
+    """Yields (raw page text, removed lines) in page order, extracting ranges in the pool.
+
+    At most `window` ranges are in flight; closing the generator early cancels
+    the ranges that have not started, so unread pages are never opened.
+    """
+    spooled_path = None
+    if isinstance(pdf_source, (bytes, bytearray)):
+        # Workers open the document by path so the bytes are not pickled per task
+        fd, spooled_path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_source)
+    pdf_path = spooled_path or pdf_source
+    pending = []
+    try:
+        pool = _get_pool(workers)
+        next_range = iter(ranges)
+        for start, stop in next_range:
+            pending.append(pool.submit(_extract_page_range, pdf_path, start, stop, boilerplate))
+            if len(pending) >= window:
+                break
+        while pending:
+            pages = pending.pop(0).result()
+            for start, stop in next_range:
+                pending.append(pool.submit(_extract_page_range, pdf_path, start, stop, boilerplate))
+                break
+            yield from pages
+    finally:
+        for future in pending:
+            future.cancel()
+        for future in pending:
+            if not future.cancelled():
+                future.exception()  # Wait for running tasks before removing the file
+        if spooled_path:
+            os.remove(spooled_path)
+
+
+def _iter_pages(pdf_source, workers, min_pages_for_pool, strip_boilerplate):
+    workers = workers or get_worker_count()
+    min_pages_for_pool = min_pages_for_pool or get_min_pages_for_pool()
+
+    doc = open_document(pdf_source)
+    page_count = doc.page_count
+    try:
+        boilerplate = detect_boilerplate(doc) if strip_boilerplate else frozenset()
+    except Exception:
+        doc.close()
+        raise
+    if workers <= 1 or page_count < min_pages_for_pool:
+        def serial():
+            with doc:
+                for page in doc:
+                    yield _page_text(page, boilerplate)
+        return page_count, serial()
+    doc.close()
+
+    batch_count = -(-page_count // STREAM_BATCH_PAGES)
+    ranges = _page_ranges(page_count, batch_count)
+    return page_count, _iter_raw_pages(pdf_source, workers, ranges, workers * CHUNKS_PER_WORKER, boilerplate)
+
+
+# --- Boilerplate Detection ---
+
+def _line_signature(text, x0, y0, page_rect):
+    """Identifies a line by its text and position; short lines have digits folded so page numbers match."""
+    normalized = WHITESPACE_RE.sub(' ', text).strip().lower()
+    if not normalized:
+        return None
+    if normalized.count(' ') < PAGE_NUMBER_MAX_WORDS:
+        normalized = DIGITS_RE.sub('#', normalized)
+    width = page_rect.width or 1.0
+    height = page_rect.height or 1.0
+    return (normalized, int(y0 / height * POSITION_BANDS), int(x0 / width * POSITION_BANDS))
+
+
+def _text_blocks(page):
+    # (x0, y0, text) of each text block; image blocks are skipped
+    return [(x0, y0, text) for x0, y0, _, _, text, _, block_type in page.get_text("blocks") if block_type == 0]
+
+
+def detect_boilerplate(doc, sample_pages=BOILERPLATE_SAMPLE_PAGES):
+    """Finds lines repeated at the same position across pages.
+
+    Running headers and footers, page numbers, copyright lines and slide
+    template text all repeat at a fixed spot on most pages. Up to
+    sample_pages pages spread over the document are read; a line (with
+    digits folded) that sits in the same position band on at least
+    BOILERPLATE_MIN_PAGES of them and BOILERPLATE_MIN_SHARE of the sample is
+    boilerplate. If that would strip more than BOILERPLATE_MAX_SHARE of the
+    sampled lines, the pages repeat as a whole (e.g. a document made of
+    copies of the same pages) and nothing is treated as boilerplate.
+
+    Args:
+        doc (fitz.Document): The open document.
+        sample_pages (int): Maximum pages to read for detection.
+
+    Returns:
+        frozenset: Line signatures to drop; empty for documents too short to tell.
+    """
+    page_count = doc.page_count
+    if page_count < BOILERPLATE_MIN_PAGES:
+        return frozenset()
+    sample_count = min(sample_pages, page_count)
+    indices = sorted({int(i * page_count / sample_count) for i in range(sample_count)})
+
+    counts = Counter()
+    sampled = []
+    for index in indices:
+        page = doc[index]
+        signatures = set()
+        for x0, y0, text in _text_blocks(page):
+            for line in text.splitlines():
+                signatures.add(_line_signature(line, x0, y0, page.rect))
+        signatures.discard(None)
+        counts.update(signatures)
+        sampled.append(signatures)
+
+    threshold = max(BOILERPLATE_MIN_PAGES, math.ceil(len(indices) * BOILERPLATE_MIN_SHARE))
+    boilerplate = frozenset(signature for signature, count in counts.items() if count >= threshold)
+    total_lines = sum(len(signatures) for signatures in sampled)
+    matched_lines = sum(len(signatures & boilerplate) for signatures in sampled)
+    if total_lines and matched_lines > total_lines * BOILERPLATE_MAX_SHARE:
+        return frozenset()
+    return boilerplate
+
+
+def _page_text(page, boilerplate):
+    """Returns (page text without boilerplate lines, list of removed lines)."""
+    if not boilerplate:
+        return page.get_text(), []
+    kept = []
+    removed = []
+    for x0, y0, text in _text_blocks(page):
+        for line in text.splitlines():
+            if _line_signature(line, x0, y0, page.rect) in boilerplate:
+                removed.append(line)
+            else:
+                kept.append(line)
+    return "\n".join(kept) + "\n" if kept else "", removed
+
+
+# --- Cleaning ---
+
+def clean_extracted_text(text):
+    # Basic cleaning: Replace multiple whitespace chars with single space
+    return WHITESPACE_RE.sub(' ', text).strip()
+
+
+# --- Extraction ---
+
+def extract_with_budget(pdf_source, max_words=None, workers=None, min_pages_for_pool=None, max_tokens=None, model=None,
+                        strip_boilerplate=True):
+    """Extracts cleaned text page by page, stopping once the budget is reached.
+
+    The budget is max_words words and/or max_tokens tokens (counted with
+    token_budget for model). Pages after the one that fills the budget are
+    never extracted (or, on the pool path, never scheduled beyond the
+    in-flight window); only the few sampled by detect_boilerplate are read
+    up front. Boilerplate lines are dropped before the budget is counted, so
+    the budget holds more real content.
+
+    Args:
+        pdf_source (str or bytes): Path to the PDF, or its raw contents.
+        max_words (int, optional): Word budget for the returned text.
+        workers (int, optional): Worker processes to use. Defaults to
+                                 get_worker_count().
+        min_pages_for_pool (int, optional): Page count from which the pool is
+                                            used. Defaults to get_min_pages_for_pool().
+        max_tokens (int, optional): Token budget for the returned text.
+        model (str, optional): Model whose tokenizer counts max_tokens.
+        strip_boilerplate (bool): Drop running headers, footers and the like.
+
+    Returns:
+        dict with keys:
+            'text' (str): Cleaned text within the budget.
+            'word_count' (int): Words in 'text'.
+            'token_count' (int): Tokens in 'text' (0 without max_tokens).
+            'page_count' (int): Pages in the document.
+            'pages_read' (int): Pages that contributed to 'text'.
+            'truncated_at_page' (int or None): 1-based page where the budget
+                                               ran out, or None if the whole
+                                               document fit.
+            'boilerplate_lines_removed' (int): Repeated lines left out of
+                                               the pages read.
+            'boilerplate_tokens_saved' (int): Tokens (for model) those lines
+                                              would have used.
+            'cleaning_version' (int): CLEANING_VERSION, for cache checks.
+
+    Raises:
+        Exception: Whatever PyMuPDF raises for unreadable documents.
+    """
+    page_count, pages = _iter_pages(pdf_source, workers, min_pages_for_pool, strip_boilerplate)
+    kept_pages = []
+    word_count = 0
+    token_count = 0
+    pages_read = 0
+    truncated_at_page = None
+    removed_lines = []
+    try:
+        for page_text, page_removed in pages:
+            pages_read += 1
+            removed_lines.extend(page_removed)
+            page_text = clean_extracted_text(page_text)
+            if not page_text:
+                continue
+
+            words = page_text.split()
+            if max_words is not None and word_count + len(words) > max_words:
+                page_text = ' '.join(words[:max_words - word_count])
+                truncated_at_page = pages_read
+            if max_tokens is not None:
+                page_tokens = token_budget.count_tokens(page_text, model)
+                if token_count + page_tokens > max_tokens:
+                    page_text, page_tokens, _ = token_budget.trim_to_token_budget(
+                        page_text, max_tokens - token_count, model
+                    )
+                    truncated_at_page = pages_read
+                token_count += page_tokens
+
+            if page_text:
+                kept_pages.append(page_text)
+                word_count += len(page_text.split())
+            if truncated_at_page:
+                break
+    finally:
+        pages.close()
+
+    return {
+        'text': ' '.join(kept_pages),
+        'word_count': word_count,
+        'token_count': token_count,
+        'page_count': page_count,
+        'pages_read': pages_read,
+        'truncated_at_page': truncated_at_page,
+        'boilerplate_lines_removed': len(removed_lines),
+        'boilerplate_tokens_saved': token_budget.count_tokens(clean_extracted_text(' '.join(removed_lines)), model),
+        'cleaning_version': CLEANING_VERSION,
+    }
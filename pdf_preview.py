@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+import fitz  # PyMuPDF
+
+import pdf_extraction
+
+# --- Default Constants ---
+DEFAULT_THUMBNAIL_WIDTH = 220  # Pixels; two thumbnails fit side by side in the app frame
+DEFAULT_PAGES_PER_VIEW = 6  # Thumbnails rendered and sent per preview page
+DEFAULT_MAX_THUMBNAILS = 256  # Rendered PNGs kept in memory across sessions
+
+
+class ThumbnailCache:
+    """In-memory LRU of rendered page thumbnails, keyed by (document hash, page, width)."""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or DEFAULT_MAX_THUMBNAILS
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        return None
+
+    def put(self, key, png_bytes):
+        with self._lock:
+            self._entries[key] = png_bytes
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# --- Rendering ---
+
+def _render_page(page, width):
+    zoom = width / page.rect.width if page.rect.width else 1.0
+    pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return pixmap.tobytes("png")
+
+
+def render_thumbnails(pdf_source, content_hash, page_numbers, cache, width=DEFAULT_THUMBNAIL_WIDTH):
+    """Renders the requested pages to PNG thumbnails, reusing cached renders.
+
+    The document is only opened if at least one page is missing from the
+    cache, and only the requested pages are rasterised.
+
+    Args:
+        pdf_source (str or bytes): Path to the PDF, or its raw contents.
+        content_hash (str): SHA-256 of the PDF (see UploadStore.put).
+        page_numbers (list): Zero-based page indices to render.
+        cache (ThumbnailCache): Cache shared between reruns and sessions.
+        width (int): Thumbnail width in pixels.
+
+    Returns:
+        list: PNG bytes for each requested page, in order.
+    """
+    thumbnails = {}
+    missing = []
+    for page_number in page_numbers:
+        cached = cache.get((content_hash, page_number, width))
+        if cached is None:
+            missing.append(page_number)
+        else:
+            thumbnails[page_number] = cached
+
+    if missing:
+        with pdf_extraction.open_document(pdf_source) as doc:
+            for page_number in missing:
+                png_bytes = _render_page(doc[page_number], width)
+                cache.put((content_hash, page_number, width), png_bytes)
+                thumbnails[page_number] = png_bytes
+
+    return [thumbnails[page_number] for page_number in page_numbers]
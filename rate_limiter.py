@@ -0,0 +1,191 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+
+from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+
+import token_budget
+import instrumentation
+
+# --- Default Constants ---
+DEFAULT_RPM = 500  # Requests per minute allowed for this process
+DEFAULT_TPM = 200000  # Tokens per minute allowed for this process
+DEFAULT_MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_CAP_SECONDS = 60.0
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to `capacity`, refilled continuously."""
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.available = float(capacity)
+        self._updated_at = time.monotonic()
+
+    def refill(self, now):
+        self.available = min(self.capacity, self.available + (now - self._updated_at) * self.refill_per_second)
+        self._updated_at = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` can be consumed (call refill first)."""
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing / self.refill_per_second)
+
+    def consume(self, amount):
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Shared requests-per-minute and tokens-per-minute limiter.
+
+    Callers reserve one request and an estimated token count before each API
+    call and wait until both buckets allow it. A 429 pauses every caller
+    until the server's Retry-After has passed.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        rpm = requests_per_minute or int(os.getenv("OPENAI_RPM_LIMIT", DEFAULT_RPM))
+        tpm = tokens_per_minute or int(os.getenv("OPENAI_TPM_LIMIT", DEFAULT_TPM))
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        """Reserves capacity if available; otherwise returns seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait <= 0:
+                self.requests.consume(1)
+                self.tokens.consume(tokens)
+            return wait
+
+    def acquire(self, tokens):
+        """Blocks until one request and `tokens` tokens are available."""
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens):
+        """Async variant of acquire; yields to the event loop while waiting."""
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """Holds back every caller for `seconds` (used on 429 responses)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def get_rate_limiter():
+    """Returns the process-wide RateLimiter, creating it on first use."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+# --- Retry Helpers ---
+
+def estimate_tokens(*texts, max_output_tokens=0):
+    """Token estimate for a request: prompt tokens plus the output allowance."""
+    return sum(token_budget.count_tokens(text) for text in texts) + max_output_tokens
+
+
+def _retry_after_seconds(error):
+    """Reads Retry-After (or retry-after-ms) from an API error, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _retry_delay(error, attempt, limiter):
+    # Full jitter, but never earlier than the server asked for
+    delay = random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+    retry_after = _retry_after_seconds(error)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    if isinstance(error, RateLimitError):
+        limiter.pause(delay)
+    return delay
+
+
+def call_with_retry(request_fn, estimated_tokens, max_retries=None, limiter=None):
+    """Runs request_fn under the shared limiter, retrying transient failures.
+
+    Rate-limit, connection, timeout and 5xx errors are retried with jittered
+    exponential backoff that honours Retry-After; anything else is raised
+    immediately.
+
+    Args:
+        request_fn (callable): Makes the API call and returns its result.
+        estimated_tokens (int): Tokens to reserve (see estimate_tokens).
+        max_retries (int, optional): Defaults to OPENAI_MAX_RETRIES or 5.
+        limiter (RateLimiter, optional): Defaults to get_rate_limiter().
+
+    Returns:
+        Whatever request_fn returns.
+
+    Raises:
+        The last error once retries are exhausted.
+    """
+    limiter = limiter or get_rate_limiter()
+    if max_retries is None:
+        max_retries = int(os.getenv("OPENAI_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+    for attempt in range(max_retries + 1):
+        limiter.acquire(estimated_tokens)
+        try:
+            return request_fn()
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            instrumentation.record(retries=attempt + 1)
+            time.sleep(_retry_delay(e, attempt, limiter))
+
+
+async def call_with_retry_async(request_fn, estimated_tokens, max_retries=None, limiter=None):
+    """Async variant of call_with_retry; request_fn returns an awaitable."""
+    limiter = limiter or get_rate_limiter()
+    if max_retries is None:
+        max_retries = int(os.getenv("OPENAI_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+    for attempt in range(max_retries + 1):
+        await limiter.acquire_async(estimated_tokens)
+        try:
+            return await request_fn()
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            instrumentation.record(retries=attempt + 1)
+            await asyncio.sleep(_retry_delay(e, attempt, limiter))
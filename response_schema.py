@@ -0,0 +1,221 @@
+import re
+import json
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library decoder
+    orjson = None
+
+# --- Default Constants ---
+MIN_QUIZ_OPTIONS = 2
+OPTION_KEYS = "abcdefghij"
+
+# Alternative field names seen in model output, mapped to the canonical ones
+FIELD_ALIASES = {
+    "key_points": {"point": ("point", "title", "concept", "name"), "description": ("description", "explanation", "detail", "details")},
+    "flashcards": {"question": ("question", "q", "front", "prompt"), "answer": ("answer", "a", "back", "response")},
+    "quiz": {"question": ("question", "q", "prompt"), "options": ("options", "choices", "answers"), "answer": ("answer", "correct", "correct_answer", "correct_option")},
+}
+
+ANSWER_KEY_RE = re.compile(r"^\(?([a-j])[\).:]?$", re.IGNORECASE)
+
+
+# --- Decoding ---
+
+def loads(text):
+    """Decodes JSON with orjson when it is installed, else the json module.
+
+    Raises:
+        ValueError: On invalid JSON (orjson's and json's decode errors both
+            subclass it).
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+# --- Field Helpers ---
+
+def _text(value):
+    # Strings are stripped; numbers become strings; anything else is unusable
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return None
+
+
+def _field(item, aliases):
+    for name in aliases:
+        if name in item:
+            return item[name]
+    return None
+
+
+def _options(value):
+    # {"a": "...", ...} is canonical; a plain list becomes a, b, c...
+    if isinstance(value, list):
+        value = dict(zip(OPTION_KEYS, value))
+    if not isinstance(value, dict):
+        return None
+    options = {}
+    for key, text in value.items():
+        key = _text(key)
+        text = _text(text)
+        if key is None or text is None:
+            return None
+        options[key.lower()] = text
+    return options if len(options) >= MIN_QUIZ_OPTIONS else None
+
+
+def _answer_key(answer, options):
+    # Accepts "a", "A", "(a)", "a)" or the text of the correct option
+    answer = _text(answer)
+    if answer is None:
+        return None
+    if answer.lower() in options:
+        return answer.lower()
+    match = ANSWER_KEY_RE.match(answer)
+    if match and match.group(1).lower() in options:
+        return match.group(1).lower()
+    for key, text in options.items():
+        if text.lower() == answer.lower():
+            return key
+    return None
+
+
+# --- Item Validators ---
+
+def _is_clean(value):
+    return type(value) is str and value != "" and not value[0].isspace() and not value[-1].isspace()
+
+
+def _key_point(item, aliases=FIELD_ALIASES["key_points"]):
+    if type(item) is dict and len(item) == 2 and _is_clean(item.get("point")) and type(item.get("description")) is str:
+        return item  # Already canonical
+    if isinstance(item, str):
+        point = _text(item)
+        return {"point": point, "description": ""} if point else None
+    if not isinstance(item, dict):
+        return None
+    point = _text(_field(item, aliases["point"]))
+    if point is None:
+        return None
+    return {"point": point, "description": _text(_field(item, aliases["description"])) or ""}
+
+
+def _flashcard(item, aliases=FIELD_ALIASES["flashcards"]):
+    if type(item) is dict and len(item) == 2 and _is_clean(item.get("question")) and _is_clean(item.get("answer")):
+        return item  # Already canonical
+    if not isinstance(item, dict):
+        return None
+    question = _text(_field(item, aliases["question"]))
+    answer = _text(_field(item, aliases["answer"]))
+    if question is None or answer is None:
+        return None
+    return {"question": question, "answer": answer}
+
+
+def _quiz_question(item, aliases=FIELD_ALIASES["quiz"]):
+    if type(item) is dict and len(item) == 3 and _is_clean(item.get("question")):
+        options = item.get("options")
+        answer = item.get("answer")
+        if (
+            type(options) is dict and len(options) >= MIN_QUIZ_OPTIONS
+            and isinstance(answer, str) and answer in options
+            and all(_is_clean(key) and key.islower() and _is_clean(text) for key, text in options.items())
+        ):
+            return item  # Already canonical
+    if not isinstance(item, dict):
+        return None
+    question = _text(_field(item, aliases["question"]))
+    options = _options(_field(item, aliases["options"]))
+    if question is None or options is None:
+        return None
+    answer = _answer_key(_field(item, aliases["answer"]), options)
+    if answer is None:
+        return None
+    return {"question": question, "options": options, "answer": answer}
+
+
+ITEM_VALIDATORS = {
+    "key_points": _key_point,
+    "flashcards": _flashcard,
+    "quiz": _quiz_question,
+}
+
+
+def repair_item(section, item):
+    """Returns item in canonical form, repaired where possible, or None if unusable.
+
+    An item that is already canonical is returned as-is (the same object).
+
+    Args:
+        section (str): 'key_points', 'flashcards' or 'quiz'.
+        item: One element of that section's list.
+    """
+    return ITEM_VALIDATORS[section](item)
+
+
+# --- Payload Validation ---
+
+def _summary(value):
+    if isinstance(value, list):
+        # Some responses split the summary into paragraphs
+        paragraphs = [_text(part) for part in value]
+        value = "\n\n".join(part for part in paragraphs if part)
+    return _text(value)
+
+
+def validate_payload(data):
+    """Validates the summary/key_points/flashcards/quiz sections of a response.
+
+    Items are checked one by one: usable ones are kept in canonical form
+    (aliased keys renamed, list options turned into a/b/c, answers given as
+    "A)" or option text mapped to their key), the rest are dropped. A
+    section left with nothing usable is removed. Other keys (e.g. the "items"
+    list of an add request) pass through untouched.
+
+    Args:
+        data (dict): The decoded response.
+
+    Returns:
+        tuple: (validated dict, report dict with 'dropped' and 'repaired'
+               item counts and the list of 'removed_sections').
+    """
+    validated = dict(data)
+    report = {"dropped": 0, "repaired": 0, "removed_sections": []}
+
+    if "summary" in data:
+        summary = _summary(data["summary"])
+        if summary is None:
+            del validated["summary"]
+            report["removed_sections"].append("summary")
+        else:
+            validated["summary"] = summary
+
+    for section, validator in ITEM_VALIDATORS.items():
+        if section not in data:
+            continue
+        items = data[section]
+        if isinstance(items, dict):
+            # A single object where a list was asked for
+            items = [items]
+        if not isinstance(items, list):
+            items = []
+        kept = []
+        for item in items:
+            repaired = validator(item)
+            if repaired is None:
+                report["dropped"] += 1
+                continue
+            if repaired is not item:
+                report["repaired"] += 1
+            kept.append(repaired)
+        if kept:
+            validated[section] = kept
+        else:
+            del validated[section]
+            report["removed_sections"].append(section)
+    return validated, report
@@ -0,0 +1,159 @@
+import json
+
+# --- Incremental JSON Parsing ---
+
+WHITESPACE = " \t\r\n"
+CONTAINER_OPEN = "{["
+CONTAINER_CLOSE = "}]"
+
+
+class IncrementalJSONParser:
+    """Parses a streamed JSON object and reports each piece as soon as it closes.
+
+    Fed the response text chunk by chunk, the parser emits:
+      - ('summary', "...", 'value') once a top-level string (or any other
+        top-level scalar or object) value is complete;
+      - ('flashcards', {...}, 'item') for each element of a top-level list as
+        soon as that element's closing bracket arrives.
+
+    Anything before the first '{' (e.g. a markdown fence) is ignored. The
+    sections seen so far are accumulated in `data`, so after the final chunk
+    `data` matches json.loads of the whole object.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.done = False
+        self.failed = False  # Set on a piece that can't be decoded; nothing after it is parsed
+        self._text = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._phase = None  # Inside the top-level object: 'key', 'colon', 'value' or 'after'
+        self._key = None
+        self._value_start = None  # Start of the current top-level value
+        self._element_start = None  # Start of the current element of a top-level list
+
+    def feed(self, chunk):
+        """Consumes the next chunk of response text.
+
+        Args:
+            chunk (str): Newly received text.
+
+        Returns:
+            list: (section key, value, 'value' | 'item') tuples completed by
+                  this chunk, in document order.
+        """
+        events = []
+        self._text += chunk
+        text = self._text
+        while self._pos < len(text) and not self.done and not self.failed:
+            i = self._pos
+            ch = text[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._on_string_end(i, events)
+                continue
+
+            depth = len(self._stack)
+            if ch in WHITESPACE or (depth == 0 and ch != "{"):
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+                self._mark_value_start(i, depth)
+            elif ch in CONTAINER_OPEN:
+                self._mark_value_start(i, depth)
+                self._stack.append(ch)
+                if depth == 0:
+                    self._phase = "key"
+                elif depth == 1 and ch == "[":
+                    self.data.setdefault(self._key, [])
+            elif ch in CONTAINER_CLOSE:
+                self._end_scalar(i, depth, events)
+                self._stack.pop()
+                self._on_container_end(i, len(self._stack), events)
+            elif ch == ":" and depth == 1 and self._phase == "colon":
+                self._phase = "value"
+            elif ch == ",":
+                self._end_scalar(i, depth, events)
+                if depth == 1:
+                    self._phase = "key"
+            else:
+                # First character of a number, true/false/null
+                self._mark_value_start(i, depth)
+        return events
+
+    # --- Internal Helpers ---
+
+    def _in_top_level_list(self, depth):
+        return depth == 2 and self._stack[1] == "["
+
+    def _mark_value_start(self, i, depth):
+        if depth == 1 and self._phase == "value" and self._value_start is None:
+            self._value_start = i
+        elif self._in_top_level_list(depth) and self._element_start is None:
+            self._element_start = i
+
+    def _emit(self, value_text, kind, events):
+        try:
+            value = json.loads(value_text)
+        except ValueError:
+            return  # Malformed piece; leave it for the full parse to report
+        if kind == "item":
+            self.data.setdefault(self._key, []).append(value)
+        else:
+            self.data[self._key] = value
+        events.append((self._key, value, kind))
+
+    def _on_string_end(self, i, events):
+        depth = len(self._stack)
+        if depth == 1 and self._phase == "key":
+            try:
+                self._key = json.loads(self._text[self._string_start:i + 1])
+            except ValueError:
+                # A malformed key (e.g. a bad escape) leaves no way to place what follows
+                self.failed = True
+                return
+            self._phase = "colon"
+        elif depth == 1 and self._value_start == self._string_start:
+            self._emit(self._text[self._value_start:i + 1], "value", events)
+            self._value_start = None
+            self._phase = "after"
+        elif self._in_top_level_list(depth) and self._element_start == self._string_start:
+            self._emit(self._text[self._element_start:i + 1], "item", events)
+            self._element_start = None
+
+    def _end_scalar(self, i, depth, events):
+        # Numbers and literals only end at the next ',' or closing bracket
+        if depth == 1 and self._value_start is not None and self._text[self._value_start] not in '"{[':
+            self._emit(self._text[self._value_start:i].strip(), "value", events)
+            self._value_start = None
+            self._phase = "after"
+        elif self._in_top_level_list(depth) and self._element_start is not None \
+                and self._text[self._element_start] not in '"{[':
+            self._emit(self._text[self._element_start:i].strip(), "item", events)
+            self._element_start = None
+
+    def _on_container_end(self, i, depth, events):
+        if depth == 0:
+            self.done = True
+        elif depth == 1 and self._value_start is not None:
+            # Lists were reported element by element; objects are reported whole
+            if self._text[self._value_start] == "{":
+                self._emit(self._text[self._value_start:i + 1], "value", events)
+            self._value_start = None
+            self._phase = "after"
+        elif self._in_top_level_list(depth) and self._element_start is not None:
+            self._emit(self._text[self._element_start:i + 1], "item", events)
+            self._element_start = None
@@ -0,0 +1,12 @@
+import passage_index
+
+
+def test_unpunctuated_text_is_split_into_bounded_passages():
+    # Bullet lists and slides lose their line breaks when whitespace is collapsed
+    text = " ".join(f"- bullet {i} on topic {i * 3}" for i in range(2000))
+
+    index = passage_index.PassageIndex(text)
+
+    assert len(index.passages) > 1
+    assert max(len(p.split()) for p in index.passages) <= passage_index.PASSAGE_MAX_WORDS
+    assert index.passages[-1].split()[-1] == text.split()[-1]
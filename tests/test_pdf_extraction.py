@@ -0,0 +1,45 @@
+import fitz
+
+import pdf_extraction
+
+
+def _slide_deck(slides, content_lines):
+    doc = fitz.open()
+    for i in range(slides):
+        page = doc.new_page()
+        page.insert_text((72, 40), "Intro to Biology")
+        for j in range(content_lines):
+            page.insert_text((72, 120 + j * 40), f"Point {j} of slide {i} about topic {i * 7 + j}")
+        page.insert_text((72, 780), "Fall term lecture notes")
+        page.insert_text((300, 800), str(i + 1))
+    return doc.tobytes()
+
+
+def test_sparse_slides_lose_their_header_and_footer():
+    result = pdf_extraction.extract_with_budget(_slide_deck(10, 2))
+
+    assert result["boilerplate_lines_removed"] == 30
+    assert "Intro to Biology" not in result["text"]
+    assert "Point 1 of slide 9" in result["text"]
+
+
+def test_document_of_repeated_pages_keeps_its_text():
+    single = fitz.open(stream=_slide_deck(1, 5), filetype="pdf")
+    doc = fitz.open()
+    for _ in range(8):
+        doc.insert_pdf(single)
+
+    result = pdf_extraction.extract_with_budget(doc.tobytes())
+
+    assert result["boilerplate_lines_removed"] == 0
+    assert "Point 4 of slide 0" in result["text"]
+
+
+def test_pool_extraction_matches_serial_extraction():
+    pdf_bytes = _slide_deck(20, 3)
+
+    serial = pdf_extraction.extract_with_budget(pdf_bytes, workers=1)
+    pooled = pdf_extraction.extract_with_budget(pdf_bytes, workers=2, min_pages_for_pool=1)
+
+    assert pooled["text"] == serial["text"]
+    assert pooled["boilerplate_lines_removed"] == serial["boilerplate_lines_removed"]
@@ -0,0 +1,11 @@
+import response_schema
+
+
+def test_non_string_quiz_answer_is_dropped_not_raised():
+    good = {"question": "Which is first?", "options": {"a": "One", "b": "Two"}, "answer": "a"}
+    bad = {"question": "Which is second?", "options": {"a": "One", "b": "Two"}, "answer": ["b"]}
+
+    validated, report = response_schema.validate_payload({"quiz": [bad, good]})
+
+    assert validated["quiz"] == [good]
+    assert report["dropped"] == 1
@@ -0,0 +1,140 @@
+import os
+import logging
+import functools
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character heuristic without the tokenizer
+    tiktoken = None
+
+# --- Default Constants ---
+DEFAULT_INPUT_TOKEN_BUDGET = 10000  # Document tokens sent in a single generation call
+FALLBACK_ENCODING = "o200k_base"  # Encoding of the gpt-4o model family
+CHARS_PER_TOKEN = 4  # Heuristic used when tiktoken is not installed or cannot load its encodings
+
+# Output size estimates per requested section (tokens)
+SUMMARY_OUTPUT_TOKENS = 200
+KEY_POINTS_OUTPUT_TOKENS = 250
+FLASHCARD_OUTPUT_TOKENS = 60
+QUIZ_QUESTION_OUTPUT_TOKENS = 90
+JSON_OVERHEAD_TOKENS = 20
+
+# Latency model: time to first token plus prefill and decode throughput
+FIRST_TOKEN_SECONDS = 0.6
+PREFILL_TOKENS_PER_SECOND = 5000.0
+DECODE_TOKENS_PER_SECOND = 80.0
+
+logger = logging.getLogger("akademiya.token_budget")
+_load_failure_logged = False
+
+
+def get_input_token_budget():
+    """Returns the document token budget (AKADEMIYA_INPUT_TOKEN_BUDGET or default)."""
+    try:
+        return max(1, int(os.getenv("AKADEMIYA_INPUT_TOKEN_BUDGET", DEFAULT_INPUT_TOKEN_BUDGET)))
+    except ValueError:
+        return DEFAULT_INPUT_TOKEN_BUDGET
+
+
+@functools.lru_cache(maxsize=8)
+def _get_encoding(model):
+    global _load_failure_logged
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception as e:
+        # tiktoken downloads encodings on first use; offline or behind a proxy that fails
+        if not _load_failure_logged:
+            _load_failure_logged = True
+            logger.warning("Could not load a tiktoken encoding (%s); estimating tokens from characters.", e)
+        return None
+
+
+# --- Counting & Trimming ---
+
+def count_tokens(text, model=None):
+    """Counts the tokens text uses for model (heuristic without tiktoken).
+
+    Args:
+        text (str): Text to measure.
+        model (str, optional): OpenAI model name; unknown models use o200k_base.
+
+    Returns:
+        int: Token count.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model or "")
+    if encoding is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def trim_to_token_budget(text, budget, model=None):
+    """Cuts text to at most budget tokens, ending on a word boundary.
+
+    Args:
+        text (str): Cleaned text.
+        budget (int): Maximum tokens to keep.
+        model (str, optional): See count_tokens.
+
+    Returns:
+        tuple: (trimmed text, its token count, whether anything was cut).
+    """
+    encoding = _get_encoding(model or "")
+    if encoding is None:
+        if len(text) // CHARS_PER_TOKEN <= budget:
+            return text, count_tokens(text, model), False
+        trimmed = text[:budget * CHARS_PER_TOKEN]
+    else:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= budget:
+            return text, len(tokens), False
+        trimmed = encoding.decode(tokens[:budget])
+
+    # Drop a partially kept trailing word
+    cut = len(trimmed)
+    if not (text.startswith(trimmed) and text[cut:cut + 1].isspace()) and " " in trimmed:
+        trimmed = trimmed.rsplit(" ", 1)[0]
+    trimmed = trimmed.rstrip()
+    return trimmed, count_tokens(trimmed, model), True
+
+
+# --- Pre-flight Estimate ---
+
+def estimate_generation(system_prompt, document_text, sections, model=None):
+    """Estimates input/output tokens and latency for one generation request.
+
+    Args:
+        system_prompt (str): The system prompt to be sent.
+        document_text (str): The document text sent as the user message.
+        sections (dict): Sections requested, as returned by
+                         utils.build_generation_prompt (flashcards/quiz map
+                         to their counts).
+        model (str, optional): See count_tokens.
+
+    Returns:
+        dict with 'input_tokens', 'output_tokens' and 'latency_seconds'.
+    """
+    input_tokens = count_tokens(system_prompt, model) + count_tokens(document_text, model)
+    output_tokens = JSON_OVERHEAD_TOKENS
+    if "summary" in sections:
+        output_tokens += SUMMARY_OUTPUT_TOKENS
+    if "key_points" in sections:
+        output_tokens += KEY_POINTS_OUTPUT_TOKENS
+    output_tokens += FLASHCARD_OUTPUT_TOKENS * int(sections.get("flashcards") or 0)
+    output_tokens += QUIZ_QUESTION_OUTPUT_TOKENS * int(sections.get("quiz") or 0)
+    latency_seconds = (
+        FIRST_TOKEN_SECONDS
+        + input_tokens / PREFILL_TOKENS_PER_SECOND
+        + output_tokens / DECODE_TOKENS_PER_SECOND
+    )
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "latency_seconds": latency_seconds,
+    }
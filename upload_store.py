@@ -0,0 +1,99 @@
+import os
+import hashlib
+import tempfile
+import threading
+
+import disk_lru
+
+# --- Default Constants ---
+DEFAULT_UPLOAD_DIR = os.path.join(tempfile.gettempdir(), "akademiya_uploads")
+DEFAULT_UPLOAD_STORE_BYTES = 1024 * 1024 * 1024  # Size bound for spooled uploads
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def upload_fingerprint(uploaded_file):
+    """Returns a cheap identity for a Streamlit upload, for change detection.
+
+    Streamlit gives every upload a file_id; older versions fall back to the
+    name and size. Either way nothing is hashed or compared byte by byte.
+    """
+    file_id = getattr(uploaded_file, "file_id", None)
+    if file_id:
+        return file_id
+    return f"{uploaded_file.name}:{uploaded_file.size}"
+
+
+class UploadStore:
+    """Content-addressed directory of uploaded PDFs, shared by every session.
+
+    Uploads are streamed to disk once, hashed while they are written, and
+    then referred to by their SHA-256 (the same hash the extraction cache
+    uses). Identical uploads from different sessions share one file. The
+    directory is trimmed, least recently used first, when it exceeds its
+    size bound; readers go through get_path so the files they use stay
+    recent. One instance is shared by every session (see get_upload_store).
+    """
+
+    def __init__(self, store_dir=None, max_bytes=None):
+        self.store_dir = store_dir or os.getenv("AKADEMIYA_UPLOAD_DIR", DEFAULT_UPLOAD_DIR)
+        self.max_bytes = max_bytes or DEFAULT_UPLOAD_STORE_BYTES
+        self._lock = threading.Lock()
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    # --- Public API ---
+
+    def put(self, file_obj):
+        """Spools a file-like object to the store.
+
+        Args:
+            file_obj: Readable binary file object (e.g. a Streamlit UploadedFile).
+
+        Returns:
+            tuple: (content hash, path of the stored PDF).
+        """
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix=".tmp")
+        try:
+            file_obj.seek(0)
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    chunk = file_obj.read(SPOOL_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+            content_hash = digest.hexdigest()
+            path = self.path_for(content_hash)
+            os.replace(tmp_path, path)  # Atomic; an identical upload just replaces the same content
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            disk_lru.evict_oldest(self.store_dir, ".pdf", self.max_bytes, keep=path)
+        return content_hash, path
+
+    def get_path(self, content_hash):
+        """Returns the stored PDF's path, or None if it has been evicted."""
+        path = self.path_for(content_hash)
+        try:
+            os.utime(path)  # Refresh recency for eviction
+        except OSError:
+            return None
+        return path
+
+    def path_for(self, content_hash):
+        return os.path.join(self.store_dir, f"{content_hash}.pdf")
+
+
+def get_upload_store():
+    """Returns the process-wide UploadStore, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = UploadStore()
+        return _store
@@ -1,40 +1,87 @@
 import os
 import re
-import json
-import streamlit as st
+import time
+import asyncio
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import APIConnectionError
+
+import llm_cache
+import client_pool
+import rate_limiter
+import notifier
+import instrumentation
+import passage_index
+import response_schema
+import stream_json
+import dedupe
 
 # --- Default Constants ---
 DEFAULT_MODEL = "gpt-4o-mini" # Or your preferred default model
 DEFAULT_TEMP = 0.7
+DEFAULT_REGEN_CONCURRENCY = 5 # Max concurrent item regenerations per request
+GENERATION_OUTPUT_TOKENS = 2000 # Output reserved against the rate limit for full generations
+REGEN_CONTEXT_PASSAGES = 3 # Passages sent when replacing one item
+ADD_CONTEXT_PASSAGES = 4 # Passages sent when adding items
+MAX_CONTEXT_PASSAGES = 8 # Upper bound for large batches of new items
+MAX_CONTEXT_WORDS = 360 # Upper bound on the document words sent with one item prompt
+DUPLICATE_RETRIES = 2 # Follow-up requests for items rejected as near-duplicates
+
+_environment_loaded = False
 
 # --- Environment & Client Initialization ---
 
 def initialize_openai_client():
-    """Loads environment variables and initializes the OpenAI client.
+    """Loads environment variables and returns the shared OpenAI client.
+
+    The client (and its keep-alive connection pool) is created once per
+    process by client_pool and reused by every session and rerun.
     
     Returns:
         OpenAI client object or None if initialization fails.
     """
-    load_dotenv()
-    client = None
+    _load_environment()
     try:
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
-            # Use st.warning here as error might be shown on page anyway
-            st.warning("OpenAI API key not found in .env. Features requiring API calls will be disabled.")
+            # A warning rather than an error: pages show their own error when the client is missing
+            notifier.warning("OpenAI API key not found in .env. Features requiring API calls will be disabled.")
             return None
-        client = OpenAI(api_key=api_key)
-        return client
+        return client_pool.get_client_pool(api_key).get_client()
     except Exception as e:
-        st.error(f"Failed to initialize OpenAI client: {e}")
+        notifier.error(f"Failed to initialize OpenAI client: {e}")
+        return None
+
+
+def initialize_async_openai_client():
+    """Loads environment variables and initializes an AsyncOpenAI client.
+
+    The async client's connection pool is bound to the event loop it is first
+    used on, so create one per asyncio.run() call.
+
+    Returns:
+        AsyncOpenAI client object or None if the API key is missing.
+    """
+    _load_environment()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
         return None
+    return client_pool.get_client_pool(api_key).new_async_client()
+
+
+def _load_environment():
+    # .env only needs reading once per process, not on every rerun
+    global _environment_loaded
+    if not _environment_loaded:
+        load_dotenv()
+        _environment_loaded = True
 
 # --- Prompt Construction ---
 
 def construct_prompt(content_types, focus_instruction=None):
-    """Constructs the system prompt for the main content generation task.
+    """Constructs the instructions for the main content generation task.
+
+    They are sent after the document text (see build_messages), so requests
+    with different types or focus still share the cached document prefix.
 
     Args:
         content_types (list): A list of strings indicating the desired content types 
@@ -43,7 +90,7 @@ def construct_prompt(content_types, focus_instruction=None):
                                            Defaults to None.
 
     Returns:
-        str: The constructed system prompt.
+        str: The constructed instructions.
     """
     prompt_parts = [
         "You are an expert educational assistant. Your task is to process the provided text and generate educational content based on the user's request.",
@@ -87,51 +134,285 @@ def construct_prompt(content_types, focus_instruction=None):
     return "\n".join(prompt_parts)
 
 
+def build_generation_prompt(summary_style=None, notes_style=None, num_flashcards=0, num_quiz=0):
+    """Builds the instructions used by the Configure Generation page.
+
+    Styles and counts only appear here, after the document text (see
+    build_messages), so changing them keeps the cached document prefix.
+
+    Args:
+        summary_style (str, optional): "Concise", "Narrative" or "Analytical".
+        notes_style (str, optional): "Outline", "Sentence" or "Concept Map".
+        num_flashcards (int): Flashcards to request (0 to skip).
+        num_quiz (int): Quiz questions to request (0 to skip).
+
+    Returns:
+        tuple: (instructions str, dict of the sections requested, keyed by
+               'summary', 'key_points', 'flashcards', 'quiz').
+    """
+    prompt_sections = []
+    sections_to_generate = {}
+
+    # Build Summary instructions
+    if summary_style:
+        sections_to_generate["summary"] = summary_style
+        if summary_style == "Narrative": summary_instruction = "Provide a narrative-style summary..."
+        elif summary_style == "Analytical": summary_instruction = "Provide an analytical summary..."
+        else: summary_instruction = "Provide a concise single-paragraph summary."
+        prompt_sections.append(summary_instruction)
+
+    # Build Key Points instructions
+    if notes_style:
+        sections_to_generate["key_points"] = notes_style
+        notes_instruction = "Generate 3-7 key points, each with a brief description."
+        if notes_style == "Outline": notes_instruction += " Structure them as a hierarchical outline."
+        elif notes_style == "Sentence": notes_instruction += " Write them as complete sentences."
+        else: notes_instruction += " Focus on relationships between concepts."
+        prompt_sections.append(notes_instruction)
+
+    # Separate Flashcards and Quiz instructions
+    if num_flashcards > 0:
+        sections_to_generate["flashcards"] = num_flashcards
+        prompt_sections.append(
+            f"Generate {num_flashcards} flashcards. "
+            f"Each MUST be an object with 'question' (string) and 'answer' (string)."
+        )
+
+    if num_quiz > 0:
+        sections_to_generate["quiz"] = num_quiz
+        prompt_sections.append(
+            f"Generate {num_quiz} multiple-choice quiz questions. "
+            f"Each MUST be an object with 'question' (string), 'options' (object with string keys like 'a', 'b', 'c', etc. and string values), and 'answer' (string matching one of the option keys)."
+        )
+
+    # Build JSON schema description parts
+    json_schema_parts = []
+    if "summary" in sections_to_generate:
+        json_schema_parts.append('  "summary": "<Generated summary text>"')
+    if "key_points" in sections_to_generate:
+        json_schema_parts.append('''  "key_points": [
+    { "point": "<Key Concept 1>", "description": "<Brief description 1>" },
+    { "point": "<Key Concept 2>", "description": "<Brief description 2>" },
+    ...
+  ]''')
+    if "flashcards" in sections_to_generate:
+        json_schema_parts.append('''  "flashcards": [
+    { "question": "<Q1>", "answer": "<A1>" },
+    { "question": "<Q2>", "answer": "<A2>" },
+    ...
+  ]''')
+    if "quiz" in sections_to_generate:
+        json_schema_parts.append('''  "quiz": [
+    { "question": "<Q1>", "options": {"a": "OptA", "b": "OptB", "c": "OptC"}, "answer": "a" },
+    { "question": "<Q2>", "options": {"a": "OptA", "b": "OptB", "c": "OptC"}, "answer": "b" },
+    ...
+  ]''')
+
+    # Combine instructions & schema for the final system prompt
+    instructions_string = "\n".join([f"- {inst}" for inst in prompt_sections])
+    json_schema_string = "{\n" + ",\n".join(json_schema_parts) + "\n}"
+
+    system_prompt_content = f"""You are an educational assistant...
+Instructions:
+{instructions_string}
+
+IMPORTANT: Output MUST be a single valid JSON object...
+JSON Structure:
+{json_schema_string}
+"""
+    return system_prompt_content, sections_to_generate
+
+
+SECTION_LABELS = {
+    "summary": "Summary",
+    "key_points": "Key Points",
+    "flashcards": "Flashcards",
+    "quiz": "Quiz",
+}
+DEFAULT_SECTION_SETTINGS = {"summary": "Concise", "key_points": "Outline", "flashcards": 10, "quiz": 5}
+
+
+def build_section_prompt(section, setting=None, focus_instruction=None):
+    """Builds minimal instructions asking for a single section.
+
+    Args:
+        section (str): 'summary', 'key_points', 'flashcards' or 'quiz'.
+        setting (str or int, optional): The section's style (summary/key
+            points) or item count (flashcards/quiz), as stored in the
+            sections dict from build_generation_prompt.
+        focus_instruction (str, optional): Extra guidance for the section.
+
+    Returns:
+        str: The instructions, or None for an unknown section.
+    """
+    if section not in SECTION_LABELS:
+        return None
+    setting = setting or DEFAULT_SECTION_SETTINGS[section]
+    if section == "summary":
+        system_prompt, _ = build_generation_prompt(summary_style=setting)
+    elif section == "key_points":
+        system_prompt, _ = build_generation_prompt(notes_style=setting)
+    elif section == "flashcards":
+        system_prompt, _ = build_generation_prompt(num_flashcards=int(setting))
+    else:
+        system_prompt, _ = build_generation_prompt(num_quiz=int(setting))
+
+    if focus_instruction and focus_instruction.strip():
+        system_prompt += f"""
+Focus Instruction: Please pay special attention to the following: {focus_instruction.strip()}
+"""
+    return system_prompt
+
+
+# --- Prompt Layout ---
+# Providers cache the longest prompt prefix they have seen recently, so every
+# request is laid out stable-first: a fixed system message, then the source
+# text, then the instructions that change between calls (styles, counts,
+# focus, the item being replaced). Repeat calls on the same document then
+# reuse the cached document prefix; usage.prompt_tokens_details.cached_tokens
+# is recorded on each span.
+
+BASE_SYSTEM_PROMPT = (
+    "You are an expert educational assistant that turns course material into study content. "
+    "Follow the instructions given after the source material, and answer with a single valid JSON object only."
+)
+
+
+def build_messages(source_text, instructions):
+    """Builds the chat messages for a request, stable prefix first.
+
+    Args:
+        source_text (str): The document text or passages; identical across
+            calls on the same document, so it forms the cacheable prefix.
+        instructions (str): The task and output format for this call.
+
+    Returns:
+        list: Chat messages for client.chat.completions.create.
+    """
+    return [
+        {"role": "system", "content": BASE_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Source material:\n\n{source_text}"},
+        {"role": "user", "content": instructions},
+    ]
+
+
+def _estimate_request_tokens(messages, max_output_tokens):
+    return rate_limiter.estimate_tokens(*(message["content"] for message in messages), max_output_tokens=max_output_tokens)
+
+
 # --- Core Content Generation ---
 
-def get_gpt_response(client, user_prompt, system_prompt_content, model="gpt-4o-mini", temperature=0.7):
+@instrumentation.traced("get_gpt_response")
+def get_gpt_response(client, user_prompt, system_prompt_content, model="gpt-4o-mini", temperature=0.7, use_cache=True,
+                     on_delta=None):
     """Calls the OpenAI API to generate content based on prompts.
 
+    Identical requests (same model, temperature and prompts) are served from
+    the shared response cache unless use_cache is False. The request is laid
+    out by build_messages, document first and instructions last. When on_delta is
+    given the response is streamed and on_delta is called with each text
+    fragment as it arrives (once with the whole text on a cache hit). Only
+    responses that finished normally and decode as JSON are cached.
+
     Args:
         client: The initialized OpenAI client.
-        user_prompt: The user's input text (e.g., extracted PDF content).
-        system_prompt_content: The system prompt defining the task and format.
+        user_prompt: The source text (e.g., extracted PDF content).
+        system_prompt_content: The instructions defining the task and format.
         model (str): The OpenAI model to use.
         temperature (float): The generation temperature.
+        use_cache (bool): Set to False for "give me something different" calls;
+                          the fresh response still replaces the cached one.
+        on_delta (callable, optional): Enables streaming; receives each fragment.
 
     Returns:
-        The AI's response content as a string, or None if an error occurs.
+        The AI's full response content as a string, or None if an error occurs.
     """
     if not client:
-        st.error("OpenAI client not available for generation.")
+        notifier.error("OpenAI client not available for generation.")
         return None
+
+    cache = llm_cache.get_response_cache()
+    cache_key = llm_cache.make_cache_key(model, temperature, system_prompt_content, user_prompt)
+    if use_cache:
+        cached_output = cache.get(cache_key)
+        if cached_output is not None:
+            instrumentation.record(cache_hit=True)
+            if on_delta:
+                on_delta(cached_output)
+            return cached_output
+    instrumentation.record(cache_hit=False, streamed=bool(on_delta))
+
+    # Streamed responses report usage in a final chunk only when asked to
+    stream_kwargs = {"stream": True, "stream_options": {"include_usage": True}} if on_delta else {}
     
     try:
-        response = client.chat.completions.create(
-            # model="gpt-4.1-nano", 
-            model=model,
-            messages=[
-                {"role": "system", "content": system_prompt_content},
-                {"role": "user", "content": user_prompt} 
-            ],
-            temperature=temperature,
-            # max_tokens=2048 # Adjust max_tokens based on expected output length or model limits
-            response_format={ "type": "json_object" } # Request JSON output directly
+        start_time = time.perf_counter()
+        # Throttled by the shared limiter; 429s and transient errors are retried with backoff
+        response = rate_limiter.call_with_retry(
+            lambda: client.chat.completions.create(
+                # model="gpt-4.1-nano", 
+                model=model,
+                messages=build_messages(user_prompt, system_prompt_content),
+                temperature=temperature,
+                # max_tokens=2048 # Adjust max_tokens based on expected output length or model limits
+                response_format={ "type": "json_object" }, # Request JSON output directly
+                **stream_kwargs
+            ),
+            rate_limiter.estimate_tokens(
+                BASE_SYSTEM_PROMPT, user_prompt, system_prompt_content, max_output_tokens=GENERATION_OUTPUT_TOKENS
+            )
         )
-        # output = response.choices[0].message.content.strip()
-        # Since we requested JSON object, the content should already be a JSON string
-        output = response.choices[0].message.content 
+        if on_delta:
+            fragments = []
+            finish_reason = None
+            for chunk in response:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if chunk.choices and chunk.choices[0].finish_reason:
+                    finish_reason = chunk.choices[0].finish_reason
+                if delta:
+                    if not fragments:
+                        instrumentation.record(first_token_ms=round((time.perf_counter() - start_time) * 1000.0, 3))
+                    fragments.append(delta)
+                    on_delta(delta)
+                if getattr(chunk, "usage", None):
+                    instrumentation.record_usage(chunk.usage)
+            output = "".join(fragments)
+        else:
+            # Since we requested JSON object, the content should already be a JSON string
+            output = response.choices[0].message.content 
+            finish_reason = response.choices[0].finish_reason
+            instrumentation.record_usage(response.usage)
+        if _is_cacheable(output, finish_reason):
+            cache.put(cache_key, output, latency=time.perf_counter() - start_time)
         return output
     except Exception as e:
-        st.error(f"Error calling OpenAI API for generation: {e}")
+        if isinstance(e, APIConnectionError):
+            client_pool.get_client_pool(client.api_key).mark_unhealthy()
+        notifier.error(f"Error calling OpenAI API for generation: {e}")
         return None
 
+def _is_cacheable(output, finish_reason):
+    # Only complete, decodable responses are cached; a cut-off one would otherwise be replayed on every hit
+    if not output or finish_reason != "stop":
+        return False
+    try:
+        response_schema.loads(output)
+    except ValueError:
+        return False
+    return True
+
 # --- JSON Parsing Helper ---
 
+@instrumentation.traced("parse_json_response")
 def parse_json_response(response_text):
     """Attempts to parse a JSON object from the AI's response text.
     
-    Handles potential markdown code fences (though less likely with response_format='json_object').
+    Responses that are already bare JSON (the norm with
+    response_format='json_object') are decoded directly, with orjson when
+    installed; markdown code fences are only searched for otherwise. The
+    summary/key_points/flashcards/quiz sections are then validated item by
+    item (see response_schema.validate_payload), so one malformed item is
+    dropped or repaired instead of failing the whole response.
     
     Args:
         response_text: The raw string response from the AI.
@@ -140,76 +421,284 @@ def parse_json_response(response_text):
         A dictionary parsed from JSON, or None if parsing fails.
     """
     if not response_text:
-        st.error("Received empty response from API.")
+        notifier.error("Received empty response from API.")
         return None
         
-    parsed_data = None
     error_message = None
-    json_string_to_parse = response_text # Start assuming the whole thing is JSON
+    json_string_to_parse = response_text.strip()
     
     try:
-        # Minimal preprocessing: remove potential markdown fences if they still appear
-        match = re.search(r'```json\n(.*?)\n```', response_text, re.DOTALL)
-        if match:
-            json_string_to_parse = match.group(1)
-        else:
-            # Optional: Trim leading/trailing whitespace that might interfere
-             json_string_to_parse = response_text.strip()
+        if not json_string_to_parse.startswith("{"):
+            # Minimal preprocessing: remove potential markdown fences if they still appear
+            match = re.search(r'```(?:json)?\s*\n(.*?)\n\s*```', response_text, re.DOTALL)
+            if match:
+                json_string_to_parse = match.group(1)
 
-        parsed_data = json.loads(json_string_to_parse)
+        parsed_data = response_schema.loads(json_string_to_parse)
         
-        # Basic validation (can be expanded based on expected structure)
         if isinstance(parsed_data, dict):
+            parsed_data, report = response_schema.validate_payload(parsed_data)
+            if report["dropped"] or report["repaired"] or report["removed_sections"]:
+                instrumentation.record(
+                    items_dropped=report["dropped"], items_repaired=report["repaired"],
+                    sections_removed=len(report["removed_sections"])
+                )
+            if report["dropped"]:
+                notifier.warning(f"Skipped {report['dropped']} malformed item(s) in the AI response.")
             return parsed_data
         else:
             error_message = "Parsed data is not a valid JSON object (dictionary)."
             
-    except json.JSONDecodeError as json_err:
+    except ValueError as json_err:
         error_message = f"Failed to decode JSON: {json_err}"
+        # Cut-off or slightly malformed output: keep every section and item that did arrive whole
+        try:
+            salvaged = salvage_json_response(response_text)
+        except Exception:
+            salvaged = None  # Fall through to the normal error report
+        if salvaged:
+            instrumentation.record(salvaged_sections=len(salvaged))
+            notifier.warning(f"The AI response was incomplete; recovered {len(salvaged)} complete section(s).")
+            return salvaged
     except Exception as e:
         error_message = f"An unexpected error occurred during JSON parsing: {e}"
 
     # If parsing failed at any point
-    st.error(f"JSON Parsing Error: {error_message}")
-    st.warning("Raw AI Response (attempted to parse):")
+    notifier.error(f"JSON Parsing Error: {error_message}")
+    notifier.warning("Raw AI Response (attempted to parse):")
     # Use a unique key to avoid duplicate widget errors if this section appears multiple times
-    st.text_area("Raw Text", json_string_to_parse, height=150, key=f"json_parsing_error_raw_{hash(json_string_to_parse)}") 
+    notifier.show_raw_text("Raw Text", json_string_to_parse, key=f"json_parsing_error_raw_{hash(json_string_to_parse)}")
     return None
 
-# --- Flashcard/Quiz Item Regeneration ---
+# --- Response Recovery ---
+
+def salvage_json_response(response_text):
+    """Recovers every complete section and item from a truncated or malformed response.
+
+    The text goes through stream_json.IncrementalJSONParser, which keeps each
+    top-level value and each list element whose closing bracket arrived
+    (skipping malformed ones), and the result is validated like a normal
+    response. A summary cut off mid-sentence is lost; a quiz cut off after
+    three questions keeps those three.
+
+    Returns:
+        dict: The recovered sections (empty if nothing usable survived).
+    """
+    parser = stream_json.IncrementalJSONParser()
+    parser.feed(response_text or "")
+    recovered, _ = response_schema.validate_payload(parser.data)
+    return {key: value for key, value in recovered.items() if value}
 
-def regenerate_item(client, item_type, original_text_context, item_to_regenerate):
-    """Generates a new, different flashcard or quiz question based on context.
+
+def missing_sections(parsed, sections):
+    """Compares a (possibly salvaged) response with what was requested.
+
+    Args:
+        parsed (dict): The parsed response.
+        sections (dict): Requested sections and their style or item count,
+            as returned by build_generation_prompt; a None setting means
+            "any amount".
+
+    Returns:
+        dict: Each incomplete section mapped to its style (summary, key
+              points) or to the number of items still missing.
+    """
+    missing = {}
+    for section, setting in sections.items():
+        value = parsed.get(section)
+        if section in ("flashcards", "quiz"):
+            have = len(value) if isinstance(value, list) else 0
+            wanted = int(setting) if setting else (0 if have else DEFAULT_SECTION_SETTINGS[section])
+            if have < wanted:
+                missing[section] = wanted - have
+        elif not value:
+            missing[section] = setting or DEFAULT_SECTION_SETTINGS[section]
+    return missing
+
+
+def _build_continuation_prompt(missing, parsed, focus_instruction=None):
+    instructions, _ = build_generation_prompt(
+        summary_style=missing.get("summary"),
+        notes_style=missing.get("key_points"),
+        num_flashcards=missing.get("flashcards", 0),
+        num_quiz=missing.get("quiz", 0)
+    )
+    existing_questions = [
+        item["question"] for section in ("flashcards", "quiz") if section in missing
+        for item in parsed.get(section) or []
+    ]
+    avoid = ""
+    if existing_questions:
+        avoid = "Do not repeat these existing questions:\n" + "\n".join(f"- {q}" for q in existing_questions) + "\n\n"
+    focus = ""
+    if focus_instruction and focus_instruction.strip():
+        focus = f"\nFocus Instruction: Please pay special attention to the following: {focus_instruction.strip()}\n"
+    return (
+        "An earlier response was cut off. The parts below are all that is still needed; "
+        "everything else was already generated.\n\n" + avoid + instructions + focus
+    )
+
+
+@instrumentation.traced("complete_response")
+def complete_response(client, source_text, parsed, sections, focus_instruction=None,
+                      model=DEFAULT_MODEL, temperature=DEFAULT_TEMP):
+    """Fills what a truncated response lacks with one short continuation request.
+
+    Only the missing sections, or the missing number of flashcards/quiz
+    questions, are asked for; new items that repeat a salvaged question are
+    skipped. The request shares the document prefix of the original one.
 
     Args:
         client: The initialized OpenAI client.
-        item_type (str): 'flashcard' or 'quiz question'.
-        original_text_context (str): The source text context.
-        item_to_regenerate (dict): The original item dictionary.
+        source_text (str): The text the original request was sent with.
+        parsed (dict): The (salvaged) response.
+        sections (dict): What was requested; see missing_sections.
+        focus_instruction (str, optional): The original focus instruction.
+        model (str): The OpenAI model to use.
+        temperature (float): The generation temperature.
 
     Returns:
-        A dictionary with the new item data, or None if failed.
+        tuple: (merged dict, list of sections the continuation completed).
+               parsed is returned unchanged if nothing is missing or the
+               continuation fails.
     """
-    if not client:
-        st.error(f"Cannot regenerate {item_type}: OpenAI client not available.")
+    missing = missing_sections(parsed, sections)
+    if not missing:
+        return parsed, []
+    instrumentation.record(continuation_sections=sorted(missing))
+
+    response_text = get_gpt_response(
+        client, source_text, _build_continuation_prompt(missing, parsed, focus_instruction),
+        model=model, temperature=temperature
+    )
+    continuation = parse_json_response(response_text) if response_text else None
+    if not continuation:
+        # get_gpt_response/parse_json_response already showed an error
+        return parsed, []
+
+    merged = dict(parsed)
+    completed = []
+    for section, setting in missing.items():
+        value = continuation.get(section)
+        if not value:
+            continue
+        if section in ("flashcards", "quiz"):
+            existing = list(merged.get(section) or [])
+            question_index = dedupe.QuestionIndex(item["question"] for item in existing)
+            added = []
+            for item in value:
+                if len(added) == setting:
+                    break
+                if question_index.is_duplicate(item["question"]):
+                    continue
+                question_index.add(item["question"])
+                added.append(item)
+            if not added:
+                continue
+            value = existing + added
+        merged[section] = value
+        completed.append(section)
+    return merged, completed
+
+# --- Section Regeneration ---
+
+@instrumentation.traced("regenerate_section")
+def regenerate_section(client, section, original_text_context, setting=None, focus_instruction=None,
+                       model=DEFAULT_MODEL, temperature=DEFAULT_TEMP):
+    """Regenerates one section (e.g. only the summary) with a minimal prompt.
+
+    Args:
+        client: The initialized OpenAI client.
+        section (str): 'summary', 'key_points', 'flashcards' or 'quiz'.
+        original_text_context (str): The source text.
+        setting (str or int, optional): See build_section_prompt.
+        focus_instruction (str, optional): Extra guidance for the section.
+        model (str): The OpenAI model to use.
+        temperature (float): The generation temperature.
+
+    Returns:
+        The new value for the section (str or list), or None if failed. The
+        caller merges it into session state; other sections are untouched.
+    """
+    label = SECTION_LABELS.get(section, section)
+    system_prompt = build_section_prompt(section, setting, focus_instruction)
+    if system_prompt is None:
+        notifier.error(f"Unknown section for regeneration: {section}")
         return None
-    
-    original_question = item_to_regenerate.get('question', '')
-    
-    # Determine expected JSON structure based on item_type
-    if item_type == 'flashcard':
-        json_structure = '{"question": "New Q", "answer": "New A"}'
-        json_keys = "question, answer"
-    elif item_type == 'quiz question':
-        json_structure = '{"question": "New Q", "options": {"a":"OptA", "b":"OptB", "c":"OptC"}, "answer": "a"}'
-        json_keys = "question, options, answer"
+
+    response_text = get_gpt_response(
+        client, original_text_context, system_prompt,
+        model=model, temperature=temperature,
+        use_cache=False # The user is explicitly asking for a different result
+    )
+    if not response_text:
+        # get_gpt_response already showed an error
+        return None
+    parsed_data = parse_json_response(response_text)
+    if parsed_data is None:
+        # parse_json_response already showed an error
+        return None
+
+    # parse_json_response already dropped or repaired malformed items
+    value = parsed_data.get(section)
+    if not value:
+        notifier.error(f"The regenerated response did not contain a usable {label} section.")
+        return None
+    return value
+
+
+# --- Flashcard/Quiz Item Regeneration ---
+
+def _context_passages(original_text_context, item=None, existing_items=None, k=REGEN_CONTEXT_PASSAGES):
+    """Selects document passages for an item prompt instead of a fixed prefix.
+
+    With an item, the passages most relevant to it are chosen; otherwise the
+    passages least covered by existing_items, so new items spread over the
+    whole document. At most MAX_CONTEXT_WORDS words are sent.
+    """
+    index = passage_index.get_passage_index(original_text_context)
+    if item is not None:
+        passages = index.relevant_to(item, k)
     else:
-        st.error(f"Unknown item_type for regeneration: {item_type}")
+        passages = index.uncovered_by(existing_items, k)
+    if not passages:
+        return original_text_context[:1000]
+    selected = []
+    word_count = 0
+    for passage in passages:
+        words = len(passage.split())
+        if selected and word_count + words > MAX_CONTEXT_WORDS:
+            break
+        selected.append(passage)
+        word_count += words
+    return "\n[...]\n".join(selected)
+
+
+def _item_schema(item_type):
+    """Returns (example JSON, comma-separated keys) for an item type, or None."""
+    if item_type == 'flashcard':
+        return '{"question": "New Q", "answer": "New A"}', "question, answer"
+    if item_type == 'quiz question':
+        return '{"question": "New Q", "options": {"a":"OptA", "b":"OptB", "c":"OptC"}, "answer": "a"}', "question, options, answer"
+    return None
+
+
+def _build_regenerate_prompt(item_type, original_text_context, item_to_regenerate):
+    """Builds the messages for replacing one item.
+
+    Returns:
+        tuple: (messages list, comma-separated expected keys), or None for an
+               unknown item_type.
+    """
+    schema = _item_schema(item_type)
+    if schema is None:
         return None
+    json_structure, json_keys = schema
+    original_question = item_to_regenerate.get('question', '')
 
-    system_prompt = f"""You are an educational assistant improving {item_type}s.
+    # The passages come first (see build_messages); a repeat change of the same item reuses them
+    instructions = f"""You are improving {item_type}s. The source material above holds the passages most relevant to the original question.
 
-Original Context (Excerpt): {original_text_context[:1000]}...
 Original Question: {original_question}
 
 Your task is to create a NEW and DIFFERENT {item_type} based on the provided context. The new item should cover a similar topic or concept if possible, but be distinct from the original question.
@@ -218,36 +707,65 @@ Your output MUST be a single JSON object with keys: {json_keys}.
 Example: {json_structure}
 Do NOT include any text outside the single JSON object.
 """
+    messages = build_messages(_context_passages(original_text_context, item=item_to_regenerate), instructions)
+    return messages, json_keys
+
+
+@instrumentation.traced("regenerate_item")
+def regenerate_item(client, item_type, original_text_context, item_to_regenerate):
+    """Generates a new, different flashcard or quiz question based on context.
+
+    Args:
+        client: The initialized OpenAI client.
+        item_type (str): 'flashcard' or 'quiz question'.
+        original_text_context (str): The source text context.
+        item_to_regenerate (dict): The original item dictionary.
+
+    Returns:
+        A dictionary with the new item data, or None if failed.
+    """
+    if not client:
+        notifier.error(f"Cannot regenerate {item_type}: OpenAI client not available.")
+        return None
+    
+    prompt = _build_regenerate_prompt(item_type, original_text_context, item_to_regenerate)
+    if prompt is None:
+        notifier.error(f"Unknown item_type for regeneration: {item_type}")
+        return None
+    messages, json_keys = prompt
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini", # Use a capable but cost-effective model
-            messages=[{"role": "system", "content": system_prompt}],
-            max_tokens=300, # Smaller max tokens for regeneration
-            temperature=0.8, # Slightly higher temp for more variation
-            response_format={ "type": "json_object" }
+        response = rate_limiter.call_with_retry(
+            lambda: client.chat.completions.create(
+                model="gpt-4o-mini", # Use a capable but cost-effective model
+                messages=messages,
+                max_tokens=300, # Smaller max tokens for regeneration
+                temperature=0.8, # Slightly higher temp for more variation
+                response_format={ "type": "json_object" }
+            ),
+            _estimate_request_tokens(messages, 300)
         )
+        instrumentation.record_usage(response.usage)
         response_text = response.choices[0].message.content # Already JSON string
         
-        new_item_data = parse_json_response(response_text)
-        
-        # Validate structure specifically for flashcard/quiz items
-        expected_keys = [key.strip() for key in json_keys.split(',')]
-        if new_item_data and all(k in new_item_data for k in expected_keys):
-            return new_item_data
-        elif new_item_data:
-             st.error(f"Regenerated {item_type} JSON missing required keys ({json_keys}).")
-             return None
-        else: 
-             # parse_json_response already showed an error
-             return None
+        parsed_data = parse_json_response(response_text)
+        if not parsed_data:
+            # parse_json_response already showed an error
+            return None
+
+        # Validate (and where possible repair) the flashcard/quiz item
+        new_item_data = _repair_item(item_type, parsed_data)
+        if new_item_data is None:
+            notifier.error(f"Regenerated {item_type} JSON missing required keys ({json_keys}).")
+        return new_item_data
 
     except Exception as e:
-        st.error(f"Error during {item_type} regeneration API call: {e}")
+        notifier.error(f"Error during {item_type} regeneration API call: {e}")
         return None
 
 # --- Flashcard/Quiz Item Addition ---
 
+@instrumentation.traced("add_new_item")
 def add_new_item(client, item_type, original_text_context, existing_items):
     """Generates one new, distinct flashcard or quiz question.
 
@@ -260,60 +778,225 @@ def add_new_item(client, item_type, original_text_context, existing_items):
     Returns:
         A dictionary with the new item data, or None if failed.
     """
-    if not client:
-        st.error(f"Cannot add {item_type}: OpenAI client not available.")
+    new_items = add_new_items(client, item_type, original_text_context, existing_items, 1)
+    if new_items is None:
+        # add_new_items already showed an error
         return None
-
-    existing_q_str = "\n".join([f"- {q.get('question', '')}" for q in existing_items])
-    
-    # Determine expected JSON structure based on item_type
-    if item_type == 'flashcard':
-        json_structure = '{"question": "New Q", "answer": "New A"}'
-        json_keys = "question, answer"
-    elif item_type == 'quiz question':
-        json_structure = '{"question": "New Q", "options": {"a":"OptA", "b":"OptB", "c":"OptC"}, "answer": "a"}'
-        json_keys = "question, options, answer"
-    else:
-        st.error(f"Unknown item_type for addition: {item_type}")
+    if not new_items:
+        notifier.error(f"Could not generate a new {item_type} distinct from the existing ones.")
         return None
-        
-    system_prompt = f"""You are an educational assistant creating {item_type}s.
+    return new_items[0]
 
-Context (Excerpt): {original_text_context[:2000]}...
+# --- Batched Flashcard/Quiz Item Addition ---
 
-Existing {item_type.capitalize()} Questions (Do not repeat these exact questions or very similar ones):
-{existing_q_str}
+ITEM_TYPE_SECTIONS = {"flashcard": "flashcards", "quiz question": "quiz"}
 
-Your task is to create ONE NEW, DISTINCT {item_type} based on the provided context that is different from the existing ones.
 
-Your output MUST be a single JSON object with keys: {json_keys}.
-Example: {json_structure}
+def _repair_item(item_type, item):
+    """Returns a generated flashcard or quiz question in canonical form, or None if unusable."""
+    return response_schema.repair_item(ITEM_TYPE_SECTIONS[item_type], item)
+
+
+def _build_add_prompt(item_type, context, json_structure, count, rejected_questions):
+    # The passages are the stable prefix; retries only change the instructions after them
+    avoid = ""
+    if rejected_questions:
+        rejected_list = "\n".join(f"- {q}" for q in rejected_questions)
+        avoid = f"""
+These questions were rejected as repeats of existing {item_type}s; ask about something else:
+{rejected_list}
+"""
+    instructions = f"""You are creating {item_type}s. The source material above holds passages not yet covered by the existing {item_type}s.
+{avoid}
+Your task is to create {count} NEW, DISTINCT {item_type}s based on the provided context. They must differ from each other.
+
+Your output MUST be a single JSON object with one key, "items", holding a list of exactly {count} objects.
+Example: {{"items": [{json_structure}, ...]}}
 Do NOT include any text outside the single JSON object.
 """
+    return build_messages(context, instructions)
+
+
+@instrumentation.traced("add_new_items")
+def add_new_items(client, item_type, original_text_context, existing_items, count):
+    """Generates several new, distinct flashcards or quiz questions in one request.
+
+    Each returned item is validated on its own, so a partially malformed batch
+    still yields its good items. Near-duplicates of existing (or earlier new)
+    questions are rejected locally with dedupe.QuestionIndex; the missing
+    slots are then re-requested, naming the rejected questions, up to
+    DUPLICATE_RETRIES times. The existing deck itself is not sent.
+
+    Args:
+        client: The initialized OpenAI client.
+        item_type (str): 'flashcard' or 'quiz question'.
+        original_text_context (str): The source text context.
+        existing_items (list): List of existing item dictionaries.
+        count (int): Number of new items to request.
+
+    Returns:
+        A list of new item dictionaries (possibly shorter than count), or None
+        if the first request failed outright.
+    """
+    if not client:
+        notifier.error(f"Cannot add {item_type}s: OpenAI client not available.")
+        return None
+
+    schema = _item_schema(item_type)
+    if schema is None:
+        notifier.error(f"Unknown item_type for addition: {item_type}")
+        return None
+    json_structure, _ = schema
+
+    existing_items = [q for q in existing_items or [] if isinstance(q, dict)]
+    question_index = dedupe.QuestionIndex(q.get('question', '') for q in existing_items)
+    # More items need more source material, up to a fixed cap
+    context = _context_passages(
+        original_text_context, existing_items=existing_items,
+        k=min(MAX_CONTEXT_PASSAGES, max(ADD_CONTEXT_PASSAGES, count))
+    )
+
+    new_items = []
+    rejected_questions = []
+    for attempt in range(DUPLICATE_RETRIES + 1):
+        missing = count - len(new_items)
+        messages = _build_add_prompt(item_type, context, json_structure, missing, rejected_questions)
+        try:
+            response = rate_limiter.call_with_retry(
+                lambda: client.chat.completions.create(
+                    model="gpt-4o-mini", # Use a capable but cost-effective model
+                    messages=messages,
+                    max_tokens=300 * missing, # Same per-item budget as a single item
+                    temperature=0.7,
+                    response_format={ "type": "json_object" }
+                ),
+                _estimate_request_tokens(messages, 300 * missing)
+            )
+            instrumentation.record_usage(response.usage)
+            response_text = response.choices[0].message.content # Already JSON string
+        except Exception as e:
+            notifier.error(f"Error during new {item_type} generation API call: {e}")
+            return new_items if attempt else None
+
+        parsed_data = parse_json_response(response_text)
+        if not parsed_data:
+            # parse_json_response already showed an error
+            return new_items if attempt else None
+        if not isinstance(parsed_data.get('items'), list):
+            notifier.error(f"Batch of new {item_type}s is missing its 'items' list.")
+            return new_items if attempt else None
+
+        # Keep every valid item that isn't a near-duplicate of an existing or earlier question
+        rejected_now = []
+        for item in parsed_data['items']:
+            item = _repair_item(item_type, item)
+            if item is None:
+                continue
+            if question_index.is_duplicate(item['question']):
+                rejected_now.append(item['question'])
+                continue
+            question_index.add(item['question'])
+            new_items.append(item)
+            if len(new_items) == count:
+                break
+
+        if len(new_items) == count or not rejected_now:
+            break
+        rejected_questions.extend(rejected_now)
+        instrumentation.record(duplicates_rejected=len(rejected_questions), duplicate_retries=attempt + 1)
+    return new_items
+
+# --- Concurrent Flashcard/Quiz Item Regeneration ---
+
+async def _regenerate_item_async(async_client, semaphore, item_type, messages):
+    async with semaphore:
+        # Each task runs in its own context, so every item gets its own span
+        with instrumentation.span("regenerate_item_async"):
+            response = await rate_limiter.call_with_retry_async(
+                lambda: async_client.chat.completions.create(
+                    model="gpt-4o-mini", # Same settings as regenerate_item
+                    messages=messages,
+                    max_tokens=300,
+                    temperature=0.8,
+                    response_format={ "type": "json_object" }
+                ),
+                _estimate_request_tokens(messages, 300)
+            )
+            instrumentation.record_usage(response.usage)
+    new_item_data = _repair_item(item_type, response_schema.loads(response.choices[0].message.content or ""))
+    if new_item_data is None:
+        raise ValueError(f"Regenerated {item_type} JSON is missing required keys or has invalid values.")
+    return new_item_data
+
+
+async def regenerate_items_async(async_client, item_type, original_text_context, items, indices,
+                                 max_concurrency=DEFAULT_REGEN_CONCURRENCY):
+    """Regenerates several items concurrently, at most max_concurrency at a time.
+
+    Args:
+        async_client: An initialized AsyncOpenAI client.
+        item_type (str): 'flashcard' or 'quiz question'.
+        original_text_context (str): The source text context.
+        items (list): The current list of item dictionaries.
+        indices (list): Positions in items to regenerate.
+        max_concurrency (int): Maximum requests in flight.
+
+    Returns:
+        dict mapping each index to its new item dictionary or to the
+        Exception that made it fail.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks = []
+    for index in indices:
+        prompt = _build_regenerate_prompt(item_type, original_text_context, items[index])
+        if prompt is None:
+            raise ValueError(f"Unknown item_type for regeneration: {item_type}")
+        tasks.append(_regenerate_item_async(async_client, semaphore, item_type, prompt[0]))
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    return dict(zip(indices, results))
+
+
+@instrumentation.traced("regenerate_items")
+def regenerate_items(item_type, original_text_context, items, indices, max_concurrency=DEFAULT_REGEN_CONCURRENCY):
+    """Synchronous entry point for regenerating several items at once.
+
+    Failures are collected per item rather than aborting the batch, and the
+    returned list is a new list so callers can swap it into session state in
+    a single assignment.
+
+    Args:
+        item_type (str): 'flashcard' or 'quiz question'.
+        original_text_context (str): The source text context.
+        items (list): The current list of item dictionaries.
+        indices (list): Positions in items to regenerate.
+        max_concurrency (int): Maximum requests in flight.
+
+    Returns:
+        tuple: (updated list of items, dict of failed index -> error message),
+               or (None, {}) if the async client could not be created.
+    """
+    async_client = initialize_async_openai_client()
+    if not async_client:
+        notifier.error(f"Cannot regenerate {item_type}s: OpenAI client not available.")
+        return None, {}
+
+    async def run():
+        async with async_client:
+            return await regenerate_items_async(
+                async_client, item_type, original_text_context, items, indices, max_concurrency
+            )
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini", # Use a capable but cost-effective model
-            messages=[{"role": "system", "content": system_prompt}],
-            max_tokens=300, # Smaller max tokens for addition
-            temperature=0.7,
-            response_format={ "type": "json_object" }
-        )
-        response_text = response.choices[0].message.content # Already JSON string
-        
-        new_item_data = parse_json_response(response_text)
-        
-        # Validate structure
-        expected_keys = [key.strip() for key in json_keys.split(',')]
-        if new_item_data and all(k in new_item_data for k in expected_keys):
-            return new_item_data
-        elif new_item_data:
-             st.error(f"Newly generated {item_type} JSON missing required keys ({json_keys}).")
-             return None
-        else:
-             # parse_json_response already showed an error
-             return None
-             
+        results = asyncio.run(run())
     except Exception as e:
-        st.error(f"Error during new {item_type} generation API call: {e}")
-        return None 
\ No newline at end of file
+        notifier.error(f"Error during {item_type} regeneration: {e}")
+        return None, {}
+
+    updated_items = list(items)
+    failures = {}
+    for index, result in results.items():
+        if isinstance(result, Exception):
+            failures[index] = str(result)
+        else:
+            updated_items[index] = result
+    return updated_items, failures